@@ -0,0 +1,376 @@
+"""
+Archive Manager - Streams workspaces into per-repository archives and restores them
+"""
+
+import gzip
+import json
+import logging
+import os
+import tarfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from git_utils import force_rmtree, run_git, last_error_line
+from repo_state import find_git_dir, read_repo_state
+from shared_manager import is_link, replace_link
+from workspace_index import WorkspaceIndex
+
+
+# Archive of the files directly in the workspace directory
+ROOT_FILES_ITEM = "_files"
+
+
+def _checked_members(tar, destination):
+    """Members of a tar stream that stay inside destination (pre-3.12 fallback filter)"""
+    destination = os.path.realpath(destination)
+
+    def inside(path):
+        resolved = os.path.realpath(os.path.join(destination, path))
+        return resolved == destination or resolved.startswith(destination + os.sep)
+
+    for member in tar:
+        if os.path.isabs(member.name) or not inside(member.name):
+            raise tarfile.TarError(f"Unsafe path in archive: {member.name}")
+        if member.issym():
+            target = os.path.join(os.path.dirname(member.name), member.linkname)
+            if os.path.isabs(member.linkname) or not inside(target):
+                raise tarfile.TarError(f"Unsafe link in archive: {member.name}")
+        elif member.islnk() and not inside(member.linkname):
+            raise tarfile.TarError(f"Unsafe link in archive: {member.name}")
+        elif not (member.isfile() or member.isdir()):
+            continue
+        yield member
+
+
+def extract_archive(archive_path, destination):
+    """Stream-extract a .tar.gz, refusing members that would land outside destination"""
+    with tarfile.open(archive_path, "r|gz") as tar:
+        if hasattr(tarfile, "data_filter"):
+            tar.extraction_filter = tarfile.data_filter
+            tar.extractall(destination)
+        else:
+            tar.extractall(destination, members=_checked_members(tar, destination))
+
+
+class ArchiveManager:
+    """Archives workspaces one repository per archive and restores them in parallel"""
+
+    MANIFEST_FILE = "archive.json"
+
+    def __init__(self, config, workspace_manager):
+        """Initialize archive manager with configuration"""
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.workspace_manager = workspace_manager
+        self.index = workspace_manager.index
+
+    @property
+    def archive_root(self):
+        """Directory holding one folder of archives per workspace"""
+        archive_dir = Path(self.config.archive_dir)
+        if not archive_dir.is_absolute():
+            archive_dir = Path(self.config.workspace_base_path) / archive_dir
+        return archive_dir
+
+    def list_archives(self):
+        """Names of the complete workspace archives"""
+        if not self.archive_root.exists():
+            return []
+        return sorted(
+            path.name for path in self.archive_root.iterdir()
+            if (path / self.MANIFEST_FILE).is_file()
+        )
+
+    def _untracked_excludes(self, item):
+        """Arcnames of untracked or ignored directories of a repository named in ARCHIVE_EXCLUDE
+
+        Only directories git reports as wholly untracked are left out, so a
+        tracked directory that happens to be named build is always archived.
+        """
+        result = run_git(["ls-files", "-z", "--others", "--directory"], cwd=item)
+        if result.returncode != 0:
+            raise OSError(f"Listing untracked files failed: {last_error_line(result.stderr)}")
+        excluded = set()
+        for path in result.stdout.split("\0"):
+            if path.endswith("/") and Path(path).name in self.config.archive_exclude:
+                excluded.add(f"{item.name}/{path.rstrip('/')}")
+        return excluded
+
+    def _excluded(self, tarinfo, excluded=None):
+        """tarfile.add filter dropping regenerable content (never inside .git)
+
+        excluded is the set of arcnames to drop for a repository; without it
+        (plain directories, which have nothing tracked) directories are
+        matched by name.
+        """
+        if excluded is not None:
+            return None if tarinfo.name in excluded else tarinfo
+        parts = Path(tarinfo.name).parts
+        if len(parts) > 1 and ".git" not in parts[1:-1] and (
+            parts[-1] in self.config.archive_exclude
+        ):
+            return None
+        return tarinfo
+
+    def _write_tar(self, target, sources, exclude_git=False, excluded=None):
+        """Stream sources ({arcname: path}) into a gzip-compressed tar, atomically"""
+        tmp_path = target.with_name(f"{target.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+
+        def member_filter(tarinfo):
+            if exclude_git and Path(tarinfo.name).name == ".git" and not tarinfo.isdir():
+                # Worktree gitdir pointers are recreated on restore
+                return None
+            return self._excluded(tarinfo, excluded)
+
+        with gzip.open(tmp_path, "wb", compresslevel=self.config.archive_compression) as stream:
+            with tarfile.open(fileobj=stream, mode="w|") as tar:
+                for arcname, path in sources.items():
+                    tar.add(str(path), arcname=arcname, filter=member_filter)
+        os.replace(tmp_path, target)
+        return target.stat().st_size
+
+    def _archive_item(self, item, staging):
+        """Archive one top-level item of a workspace, returning its manifest record"""
+        name = item.name
+        shared_checkout = self.workspace_manager.shared_manager.linked_checkout(item)
+        if shared_checkout is not None:
+            state = read_repo_state(shared_checkout)
+            return {"kind": "shared", "target": str(shared_checkout),
+                    "url": state.remote_url, "sha": state.head_sha}
+        if is_link(item):
+            return {"kind": "link", "target": os.readlink(item)}
+
+        record = {"kind": "directory", "archive": f"{name}.tar.gz"}
+        state = read_repo_state(item)
+        exclude_git = False
+        excluded = None
+        if state.complete:
+            excluded = self._untracked_excludes(item)
+            record.update(url=state.remote_url, branch=state.branch, sha=state.head_sha,
+                          upstream=state.upstream)
+            if state.is_worktree:
+                # The object store is the central clone's; only commits that
+                # exist nowhere else are kept, as a bundle.
+                record["kind"] = "worktree"
+                exclude_git = True
+                result = run_git(["rev-list", "--count", "HEAD", "--not", "--remotes"],
+                                 cwd=item)
+                if result.returncode == 0 and result.stdout.strip() not in ("", "0"):
+                    bundle = staging / f"{name}.bundle"
+                    result = run_git(["bundle", "create", "--quiet", str(bundle),
+                                      "HEAD", "--not", "--remotes"], cwd=item)
+                    if result.returncode != 0:
+                        raise OSError(f"Bundling unpushed commits failed: "
+                                      f"{last_error_line(result.stderr)}")
+                    record["bundle"] = bundle.name
+            else:
+                record["kind"] = "clone"
+                alternates = find_git_dir(item) / "objects" / "info" / "alternates"
+                if alternates.is_file():
+                    record["alternates"] = alternates.read_text(encoding="utf-8").split()
+
+        record["bytes"] = self._write_tar(
+            staging / record["archive"], {name: item}, exclude_git=exclude_git,
+            excluded=excluded
+        )
+        return record
+
+    def archive(self, workspace_path):
+        """Archive a workspace concurrently, one archive per top-level item
+
+        Returns (success, {"path": archive folder, "items": {name: record or error}}).
+        The archive folder is only published when every item was archived.
+        """
+        workspace_path = Path(workspace_path)
+        target = self.archive_root / workspace_path.name
+        staging = self.archive_root / f".{workspace_path.name}.partial-{os.getpid()}"
+        force_rmtree(staging)
+        staging.mkdir(parents=True)
+
+        items, root_files = [], {}
+        for item in sorted(workspace_path.iterdir()):
+            if item.name.endswith((".lock", ".partial")):
+                continue
+            if item.is_dir() or is_link(item):
+                items.append(item)
+            elif item.name != WorkspaceIndex.MANIFEST_FILE:
+                root_files[item.name] = item
+
+        def archive_item(item):
+            try:
+                return item.name, True, self._archive_item(item, staging)
+            except (OSError, tarfile.TarError) as e:
+                return item.name, False, str(e)
+
+        with ThreadPoolExecutor(max_workers=self.config.archive_workers) as executor:
+            outcomes = list(executor.map(archive_item, items))
+        if root_files:
+            try:
+                size = self._write_tar(staging / f"{ROOT_FILES_ITEM}.tar.gz", root_files)
+                outcomes.append((ROOT_FILES_ITEM, True, {
+                    "kind": "files", "archive": f"{ROOT_FILES_ITEM}.tar.gz", "bytes": size
+                }))
+            except (OSError, tarfile.TarError) as e:
+                outcomes.append((ROOT_FILES_ITEM, False, str(e)))
+
+        results = {name: record for name, _, record in outcomes}
+        if not all(success for _, success, _ in outcomes):
+            force_rmtree(staging)
+            return False, {"path": target, "items": results}
+
+        manifest = {
+            "workspace": workspace_path.name,
+            "source": str(workspace_path),
+            "archived_at": datetime.now().isoformat(timespec="seconds"),
+            "items": results,
+            "manifest": self.index.load_manifest(workspace_path),
+        }
+        with open(staging / self.MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        if target.exists():
+            # Replacing an earlier archive of the same workspace
+            old = target.with_name(f".{target.name}.old-{os.getpid()}")
+            os.replace(target, old)
+            os.replace(staging, target)
+            force_rmtree(old)
+        else:
+            os.replace(staging, target)
+        return True, {"path": target, "items": results}
+
+    def load_archive(self, name):
+        """Manifest of an archive, or None"""
+        try:
+            with open(self.archive_root / name / self.MANIFEST_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _repo_for(self, name, record):
+        """Configured repository of an archived item, or one built from the record"""
+        for repo in self.config.repositories:
+            if repo["name"] == name:
+                return repo
+        return {"name": name, "url": record.get("url"), "branch": record.get("upstream"),
+                "mode": record["kind"]}
+
+    def _restore_item(self, archive_path, workspace_path, name, record):
+        """Restore one archived item into workspace_path"""
+        kind = record["kind"]
+        repo_path = workspace_path / name
+
+        if kind == "link":
+            replace_link(record["target"], repo_path)
+            return "Link recreated"
+
+        if kind == "shared":
+            if Path(record["target"]).is_dir():
+                replace_link(record["target"], repo_path)
+                return f"Linked {Path(record['target']).name}"
+            # The checkout was pruned: recreate the same commit
+            repo = dict(self._repo_for(name, record), branch=record["sha"])
+            success, result = self.workspace_manager.add_shared_repository(repo, workspace_path)
+            if not success:
+                raise OSError(result)
+            return "Shared checkout recreated"
+
+        if kind == "files":
+            extract_archive(archive_path / record["archive"], workspace_path)
+            return "Extracted"
+
+        if kind == "worktree":
+            repo = dict(self._repo_for(name, record), mode="worktree")
+            success, result = self.workspace_manager.add_worktree_repository(
+                repo, workspace_path
+            )
+            if not success:
+                raise OSError(result)
+            if record.get("bundle"):
+                result = run_git(["fetch", "--quiet", str(archive_path / record["bundle"]),
+                                  "HEAD"], cwd=repo_path)
+                if result.returncode != 0:
+                    raise OSError(f"Restoring unpushed commits failed: "
+                                  f"{last_error_line(result.stderr)}")
+            result = run_git(["reset", "--quiet", "--hard", record["sha"]], cwd=repo_path)
+            if result.returncode != 0:
+                raise OSError(f"Resetting to {record['sha'][:8]} failed: "
+                              f"{last_error_line(result.stderr)}")
+            # Local changes go on top of the restored commit
+            extract_archive(archive_path / record["archive"], workspace_path)
+            return f"Worktree at {record['sha'][:8]}"
+
+        # Clones and plain directories: publish only once fully extracted
+        staging = workspace_path / f".{name}.partial"
+        force_rmtree(staging)
+        staging.mkdir()
+        extract_archive(archive_path / record["archive"], staging)
+        os.replace(staging / name, repo_path)
+        staging.rmdir()
+
+        message = "Extracted"
+        for alternate in record.get("alternates", []):
+            if Path(alternate).is_dir():
+                continue
+            # The mirror it borrowed objects from is gone or lives elsewhere
+            mirror_manager = self.workspace_manager.mirror_manager
+            success, mirror = mirror_manager.update_mirror(record["url"])
+            if not success:
+                raise OSError(f"Recreating mirror failed: {mirror}")
+            alternates = find_git_dir(repo_path) / "objects" / "info" / "alternates"
+            alternates.write_text(f"{mirror / 'objects'}\n", encoding="utf-8")
+            message = "Extracted, mirror recreated"
+        return message
+
+    def restore(self, name):
+        """Restore an archive into a new workspace, in parallel per item
+
+        The workspace keeps its archived name if that is free. Returns
+        (success, {"path": workspace, "items": {name: (success, message)}}).
+        """
+        archive = self.load_archive(name)
+        if archive is None:
+            return False, {"path": None, "items": {}, "error": f"No archive named {name}"}
+        archive_path = self.archive_root / name
+
+        workspace_path = self.workspace_manager.create_workspace(
+            Path(self.config.workspace_base_path) / archive["workspace"]
+        )
+
+        def restore_item(entry):
+            item_name, record = entry
+            try:
+                return item_name, True, self._restore_item(
+                    archive_path, workspace_path, item_name, record
+                )
+            except (OSError, tarfile.TarError) as e:
+                return item_name, False, str(e)
+
+        with ThreadPoolExecutor(max_workers=self.config.archive_workers) as executor:
+            outcomes = list(executor.map(restore_item, archive["items"].items()))
+
+        archived = archive.get("manifest", {})
+
+        def update(manifest):
+            for key in ("repos", "steps", "eclipse", "deployments"):
+                if key in archived:
+                    manifest[key] = archived[key]
+            # build/ was not archived, so the next run must build again
+            manifest["build"] = {
+                "fingerprint": None,
+                "success": False,
+                "message": "Restored from archive without build outputs",
+                "built_at": None,
+            }
+            manifest["restored"] = {
+                "archive": str(archive_path),
+                "archived_at": archive.get("archived_at"),
+                "restored_at": datetime.now().isoformat(timespec="seconds"),
+            }
+
+        self.index.update_manifest(workspace_path, update)
+        results = {item_name: (success, message) for item_name, success, message in outcomes}
+        return all(success for _, success, _ in outcomes), {
+            "path": workspace_path, "items": results
+        }
@@ -3,15 +3,24 @@ Workspace Automation - Main orchestration script
 One-click setup for workspace, repositories, Eclipse, and Tomcat
 """
 
+import os
 import sys
+import time
+import argparse
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
+from archive_manager import ArchiveManager
 from config import Config
+from file_lock import FileLock
+from git_utils import lower_process_priority, start_ssh_multiplexing, stop_ssh_multiplexing
 from workspace_manager import WorkspaceManager
 from eclipse_manager import EclipseManager
 from build_manager import BuildManager
+from prune_manager import PruneManager
+from usage_manager import CATEGORIES, UsageManager, format_size
 
 
 class WorkspaceAutomation:
@@ -33,6 +42,9 @@ class WorkspaceAutomation:
             self.workspace_manager = WorkspaceManager(self.config)
             self.eclipse_manager = EclipseManager(self.config)
             self.build_manager = BuildManager(self.config)
+            self.prune_manager = PruneManager(self.config, self.workspace_manager)
+            self.usage_manager = UsageManager(self.config)
+            self.archive_manager = ArchiveManager(self.config, self.workspace_manager)
         except Exception as e:
             self.logger.error(f"Configuration error: {str(e)}")
             sys.exit(1)
@@ -109,9 +121,14 @@ class WorkspaceAutomation:
         try:
             workspace_path, is_new = self.workspace_manager.select_or_create_workspace()
 
+            instantiated = False
             if is_new:
-                self.workspace_manager.create_workspace(workspace_path)
+                workspace_path = self.workspace_manager.create_workspace(workspace_path)
                 print(f"[OK] Workspace created: {workspace_path}\n")
+                if self.config.use_golden_workspace:
+                    instantiated = self.instantiate_from_golden(workspace_path)
+                    # Everything else is handled like an existing workspace
+                    is_new = not instantiated
             else:
                 print(f"[OK] Using existing workspace: {workspace_path}\n")
         except Exception as e:
@@ -132,15 +149,39 @@ class WorkspaceAutomation:
         else:
             # Existing workspace - validate and clone missing repos
             print("Validating existing workspace...\n")
-            existing_repos, missing_repos = (
+            existing_repos, missing_repos, mismatched_repos = (
                 self.workspace_manager.validate_workspace_repos(workspace_path)
             )
 
+            for mismatch in mismatched_repos:
+                for reason in mismatch["reasons"]:
+                    print(f"[WARNING] {mismatch['repo']['name']}: {reason}")
+                if mismatch["unusable"]:
+                    print(f"[WARNING] {mismatch['repo']['name']}: left untouched, "
+                          f"fix or remove it to have it cloned again")
+            if mismatched_repos:
+                print("")
+
             if existing_repos:
                 print("[OK] Already cloned repositories:")
                 for repo in existing_repos:
                     print(f"     - {repo['name']}")
                 print("")
+                self.workspace_manager.sync_sparse_checkouts(
+                    workspace_path, existing_repos
+                )
+
+                if self.config.refresh_existing_repos or instantiated:
+                    print("Refreshing existing repositories...\n")
+                    refresh_results = self.workspace_manager.refresh_repositories(
+                        workspace_path, existing_repos
+                    )
+                    for result in refresh_results:
+                        print(
+                            f"     {result['repo']:<24} {result['status']:<11} "
+                            f"{result['message']}"
+                        )
+                    print("")
 
             if missing_repos:
                 print(f"[INFO] Found {len(missing_repos)} missing repository(ies)\n")
@@ -157,6 +198,8 @@ class WorkspaceAutomation:
         for result in clone_results:
             if result["success"]:
                 print(f"[OK] Successfully cloned: {result['repo']}")
+                if result.get("lfs_seconds") is not None:
+                    print(f"     LFS transfer: {result['lfs_seconds']:.1f}s")
             else:
                 print(f"[FAIL] Failed to clone: {result['repo']} - {result['result']}")
                 all_cloned = False
@@ -164,6 +207,8 @@ class WorkspaceAutomation:
         if not all_cloned and clone_results:
             print("\n[WARNING] Some repositories failed to clone, continuing...")
 
+        self.workspace_manager.index.record_repos(workspace_path, self.config.repositories)
+
         # Step 4: Configure Eclipse project
         print("\n" + "=" * 70)
         print("  STEP 3: Configuring Eclipse Project")
@@ -176,6 +221,9 @@ class WorkspaceAutomation:
             if success:
                 print(f"[OK] Eclipse project configured")
                 print(f"     Eclipse workspace: {eclipse_workspace}")
+                self.workspace_manager.index.record_step(
+                    workspace_path, "eclipse", {"workspace": str(eclipse_workspace)}
+                )
             else:
                 print("[ERROR] Failed to configure Eclipse project")
         except Exception as e:
@@ -189,7 +237,18 @@ class WorkspaceAutomation:
         eclipse_repo = self.config.get_eclipse_repo()
         project_path = workspace_path / eclipse_repo["name"]
 
-        build_success, build_msg = self.build_manager.build_project(project_path)
+        fingerprint = self.build_manager.build_fingerprint(project_path)
+        previous_build = self.workspace_manager.index.load_manifest(workspace_path).get("build", {})
+        if (instantiated and previous_build.get("success")
+                and previous_build.get("fingerprint") == fingerprint
+                and self.build_manager.find_war_file(project_path)):
+            # The golden workspace was built from exactly these inputs
+            build_success, build_msg = True, "Up to date (copied from golden workspace)"
+        else:
+            build_success, build_msg = self.build_manager.build_project(project_path)
+        self.workspace_manager.index.record_build(
+            workspace_path, fingerprint, build_success, build_msg
+        )
 
         if build_success:
             print(f"[OK] Build successful: {build_msg}")
@@ -204,6 +263,9 @@ class WorkspaceAutomation:
                 )
                 if deploy_success:
                     print(f"[OK] Deployed to Tomcat: {deploy_msg}")
+                    self.workspace_manager.index.record_deployment(
+                        workspace_path, war_file, deploy_msg
+                    )
                 else:
                     print(f"[WARNING] Deployment warning: {deploy_msg}")
             else:
@@ -220,6 +282,7 @@ class WorkspaceAutomation:
 
         if start_success:
             print(f"[OK] Tomcat started: {start_msg}")
+            self.workspace_manager.index.record_step(workspace_path, "tomcat")
         else:
             print(f"[WARNING] Tomcat start warning: {start_msg}")
 
@@ -230,6 +293,10 @@ class WorkspaceAutomation:
         print(f"\n  Workspace Location  : {workspace_path}")
         print(f"  Eclipse Workspace   : {eclipse_workspace}")
         print(f"  Application URL     : http://localhost:{self.config.tomcat_port}")
+        lfs_seconds = self.workspace_manager.lfs_seconds
+        if lfs_seconds:
+            print(f"  LFS Transfer Time   : {sum(lfs_seconds.values()):.1f}s "
+                  f"({len(lfs_seconds)} repo(s))")
         print(f"\n  Next Steps:")
         print(f"    1. Launch Eclipse   : {self.config.eclipse_path}")
         print(f"    2. Select Workspace : {eclipse_workspace}")
@@ -238,12 +305,517 @@ class WorkspaceAutomation:
 
         return True
 
+    def instantiate_from_golden(self, workspace_path):
+        """Fill a new workspace from the golden workspace, returning True on success"""
+        golden_manager = self.workspace_manager.golden_manager
+        print(f"Instantiating from golden workspace: {golden_manager.golden_link}")
+        success, result = golden_manager.instantiate(workspace_path)
+        if not success:
+            print(f"[WARNING] {result}, cloning instead\n")
+            return False
+
+        print(
+            f"[OK] Instantiated in {result['seconds']:.1f}s "
+            f"({result['reflinked']} reflinked, {result['hardlinked']} hardlinked, "
+            f"{result['copied']} copied, {result['linked']} links)\n"
+        )
+        return True
+
+    def build_golden(self, once=False, full=False):
+        """Keep the golden workspace built from the latest commits on a schedule"""
+        print("\n" + "=" * 70)
+        print("  BUILDING GOLDEN WORKSPACE")
+        print("=" * 70 + "\n")
+
+        golden_manager = self.workspace_manager.golden_manager
+        print(f"Golden workspace: {golden_manager.golden_link}")
+        if not once:
+            print(f"Rebuilding every {self.config.golden_interval} minute(s), "
+                  f"press Ctrl+C to stop")
+        print("")
+
+        while True:
+            lock = FileLock(golden_manager.lock_path)
+            if lock.acquire(blocking=False):
+                try:
+                    success = self._build_golden_once(full=full)
+                finally:
+                    lock.release()
+            else:
+                print(f"[{datetime.now():%H:%M:%S}] [INFO] Another golden build is running, "
+                      f"skipping")
+                success = True
+
+            if once:
+                return success
+            time.sleep(self.config.golden_interval * 60)
+
+    def _build_golden_once(self, full=False):
+        """Build a new golden workspace and publish it only if the build succeeds"""
+        golden_manager = self.workspace_manager.golden_manager
+        index = self.workspace_manager.index
+        current = None if full else golden_manager.get_golden()
+        if current is not None and self.workspace_manager.validate_workspace_repos(current)[2]:
+            print("[INFO] Golden workspace no longer matches .env, cloning from scratch\n")
+            current = None
+        build_path = golden_manager.new_build_path()
+        print(f"[{datetime.now():%H:%M:%S}] Building into {build_path}\n")
+
+        success, message = self._populate_golden(build_path, current)
+        if success and current is not None:
+            project_path = build_path / self.config.get_eclipse_repo()["name"]
+            golden_repos = index.load_manifest(current).get("repos", {})
+            build_manifest = index.load_manifest(build_path)
+            unchanged = (
+                all(build_manifest["repos"].get(repo["name"], {}).get("sha")
+                    == golden_repos.get(repo["name"], {}).get("sha")
+                    for repo in self.config.repositories)
+                and build_manifest.get("build", {}).get("fingerprint")
+                == self.build_manager.build_fingerprint(project_path)
+            )
+            if unchanged:
+                self.workspace_manager.remove_workspace(build_path)
+                print(f"[OK] Golden workspace is up to date: {current}\n")
+                return True
+
+        if success:
+            success, message = self._build_golden_project(build_path)
+
+        if not success:
+            # The current golden workspace stays in place
+            print(f"[FAIL] {message}")
+            self.workspace_manager.remove_workspace(build_path)
+            print(f"[INFO] Discarded {build_path.name}\n")
+            return False
+
+        shas = {name: info.get("sha") for name, info in
+                index.load_manifest(build_path).get("repos", {}).items()}
+        index.record_step(build_path, "golden_build", {"repos": shas})
+        golden_manager.publish(build_path)
+        print(f"[OK] Published golden workspace: {build_path}")
+        for name, sha in shas.items():
+            print(f"     {name:<24} {sha[:12] if sha else 'unknown'}")
+
+        for old_build in golden_manager.old_builds(self.config.golden_keep_builds):
+            removed, _ = self.workspace_manager.remove_workspace(old_build)
+            if removed:
+                print(f"[INFO] Removed old golden build {old_build.name}")
+        print("")
+        return True
+
+    def _populate_golden(self, build_path, current):
+        """Copy and refresh the current golden workspace, or clone from scratch"""
+        workspace_manager = self.workspace_manager
+        repos = self.config.repositories
+        if current is not None:
+            success, result = workspace_manager.golden_manager.instantiate(build_path)
+            if not success:
+                return False, result
+            existing, repos, mismatched = workspace_manager.validate_workspace_repos(build_path)
+            unusable = [m["repo"]["name"] for m in mismatched if m["unusable"]]
+            if unusable:
+                return False, f"Unusable repositories in the golden copy: {', '.join(unusable)}"
+            print("Refreshing repositories...\n")
+            for result in workspace_manager.refresh_repositories(build_path, existing):
+                print(f"     {result['repo']:<24} {result['status']:<11} {result['message']}")
+                # A golden workspace must match the remote exactly
+                if result["status"] not in ("updated", "up-to-date"):
+                    return False, f"Refreshing {result['repo']} failed: {result['message']}"
+            print("")
+
+        for result in workspace_manager.clone_all_repositories(build_path, repos):
+            if not result["success"]:
+                return False, f"Cloning {result['repo']} failed: {result['result']}"
+        workspace_manager.index.record_repos(build_path, self.config.repositories)
+        return True, build_path
+
+    def _build_golden_project(self, build_path):
+        """Configure Eclipse and build the project of a golden workspace"""
+        try:
+            success, eclipse_workspace = self.eclipse_manager.setup_project(build_path)
+        except Exception as e:
+            return False, f"Eclipse configuration error: {str(e)}"
+        if not success:
+            return False, "Failed to configure Eclipse project"
+        self.workspace_manager.index.record_step(
+            build_path, "eclipse", {"workspace": str(eclipse_workspace)}
+        )
+
+        project_path = build_path / self.config.get_eclipse_repo()["name"]
+        build_success, build_msg = self.build_manager.build_project(project_path)
+        self.workspace_manager.index.record_build(
+            build_path, self.build_manager.build_fingerprint(project_path),
+            build_success, build_msg
+        )
+        if not build_success:
+            return False, f"Build failed: {build_msg}"
+        print(f"[OK] Build successful: {build_msg}")
+        return True, build_msg
+
+    def prune(self, keep_last, max_age_days, budget_gb, dry_run=False):
+        """Delete workspaces outside the retention policy and compact the shared stores"""
+        print("\n" + "=" * 70)
+        print("  PRUNING WORKSPACES" + (" (DRY RUN)" if dry_run else ""))
+        print("=" * 70 + "\n")
+
+        prune_manager = self.prune_manager
+        policy = f"Keeping the last {keep_last} and those used within {max_age_days} day(s)"
+        if budget_gb:
+            policy += f", at most {budget_gb:g} GB in total"
+        print(policy + "\n")
+
+        with prune_manager.lock():
+            entries = prune_manager.plan(keep_last, max_age_days, int(budget_gb * 1024 ** 3))
+            for entry in entries:
+                size = format_size(entry["size"]) if entry["size"] is not None else ""
+                action = "PRUNE" if entry["prune"] else "keep"
+                print(f"  {entry['path'].name:<20} {entry['age_days']:6.1f} days {size:>10}  "
+                      f"{action:<5}  {entry['reason']}")
+            to_prune = [entry for entry in entries if entry["prune"]]
+            print(f"\n{len(to_prune)} of {len(entries)} workspace(s) to prune\n")
+            if dry_run:
+                return True
+
+            # Renaming takes each workspace out of use at once; the slow
+            # deletion below can be interrupted and resumes on the next run.
+            all_ok = True
+            for entry in to_prune:
+                try:
+                    prune_manager.move_to_trash(entry["path"])
+                except OSError as e:
+                    print(f"[FAIL] {entry['path'].name}: {str(e)}")
+                    all_ok = False
+
+            for item, success, message in prune_manager.empty_trash():
+                if success:
+                    print(f"[OK] Deleted {item.name}")
+                else:
+                    print(f"[FAIL] {item.name}: {message}")
+                    all_ok = False
+
+            print("\nCompacting shared repository stores...\n")
+            for success, message in prune_manager.collect_garbage():
+                print(f"[{'OK' if success else 'FAIL'}] {message}")
+                all_ok = all_ok and success
+        print("")
+        return all_ok
+
+    def report_usage(self, rescan=False):
+        """Print disk usage per workspace, repository and category, then the shared stores"""
+        print("\n" + "=" * 70)
+        print("  DISK USAGE")
+        print("=" * 70 + "\n")
+
+        workspace_manager = self.workspace_manager
+        workspaces = [path for path in workspace_manager.index.list_workspaces() if path.is_dir()]
+        stores = [
+            workspace_manager.mirror_manager.mirror_root,
+            workspace_manager.worktree_manager.store_root,
+            workspace_manager.shared_manager.store_root,
+            workspace_manager.bundle_manager.cache_root,
+            workspace_manager.golden_manager.builds_dir,
+            self.prune_manager.trash_root,
+            self.archive_manager.archive_root,
+        ]
+        stores = [path for path in stores if path.is_dir()]
+
+        started = time.monotonic()
+        # Workspaces first, oldest first: a hardlinked file counts for the
+        # workspace it was first created in, not for its copies.
+        report = self.usage_manager.measure(workspaces + stores, use_cache=not rescan)
+        elapsed = time.monotonic() - started
+
+        for path in workspaces:
+            usage = report[os.path.abspath(path)]
+            print(f"  {path.name:<30} {format_size(usage['total']):>10}")
+            items = sorted(usage["items"].items(), key=lambda item: -sum(item[1].values()))
+            for name, categories in items:
+                total = sum(categories.values())
+                breakdown = "  ".join(
+                    f"{category} {format_size(categories[category])}"
+                    for category in CATEGORIES if categories[category]
+                )
+                label = "(files)" if name == "." else name
+                print(f"    {label:<28} {format_size(total):>10}   {breakdown}")
+            print("")
+
+        if stores:
+            print("  Shared stores")
+            for path in stores:
+                usage = report[os.path.abspath(path)]
+                print(f"    {path.name:<28} {format_size(usage['total']):>10}")
+            print("")
+
+        total = sum(usage["total"] for usage in report.values())
+        print(f"  Total: {format_size(total)} "
+              f"({len(workspaces)} workspace(s), measured in {elapsed:.1f}s)\n")
+        return True
+
+    def archive_workspace(self, workspace, remove=False):
+        """Archive a workspace into ARCHIVE_DIR and optionally delete it afterwards"""
+        print("\n" + "=" * 70)
+        print("  ARCHIVING WORKSPACE")
+        print("=" * 70 + "\n")
+
+        workspace_path = Path(workspace)
+        if not workspace_path.is_absolute():
+            workspace_path = Path(self.config.workspace_base_path) / workspace
+        if not workspace_path.is_dir():
+            print(f"[ERROR] Workspace not found: {workspace_path}\n")
+            return False
+
+        print(f"Archiving {workspace_path} to {self.archive_manager.archive_root}\n")
+        started = time.monotonic()
+        success, result = self.archive_manager.archive(workspace_path)
+        for name, record in result["items"].items():
+            if isinstance(record, str):
+                print(f"[FAIL] {name}: {record}")
+            elif record.get("archive"):
+                note = ", with unpushed commits" if record.get("bundle") else ""
+                print(f"[OK] {name:<24} {record['kind']:<9} "
+                      f"{format_size(record['bytes']):>10}{note}")
+            else:
+                print(f"[OK] {name:<24} {record['kind']:<9} -> {record['target']}")
+
+        if not success:
+            print("\n[ERROR] Archive incomplete, nothing was written\n")
+            return False
+        print(f"\n[OK] Archived to {result['path']} in {time.monotonic() - started:.1f}s")
+
+        if remove:
+            removed, message = self.workspace_manager.remove_workspace(workspace_path)
+            if not removed:
+                print(f"[ERROR] {message}\n")
+                return False
+            print(f"[OK] Removed {workspace_path}")
+        print("")
+        return True
+
+    def restore_workspace(self, name=None, rebuild=False):
+        """Restore an archived workspace, or list the archives when no name is given"""
+        print("\n" + "=" * 70)
+        print("  RESTORING WORKSPACE")
+        print("=" * 70 + "\n")
+
+        if not name:
+            archives = self.archive_manager.list_archives()
+            print(f"Archives in {self.archive_manager.archive_root}:")
+            for archive in archives:
+                print(f"  - {archive}")
+            if not archives:
+                print("  (none)")
+            print("")
+            return True
+
+        started = time.monotonic()
+        success, result = self.archive_manager.restore(name)
+        if result.get("error"):
+            print(f"[ERROR] {result['error']}\n")
+            return False
+        for item, (item_success, message) in result["items"].items():
+            print(f"[{'OK' if item_success else 'FAIL'}] {item:<24} {message}")
+        workspace_path = result["path"]
+        if not success:
+            print(f"\n[ERROR] Restore of {workspace_path} is incomplete\n")
+            return False
+        print(f"\n[OK] Restored to {workspace_path} in {time.monotonic() - started:.1f}s")
+
+        if rebuild:
+            project_path = workspace_path / self.config.get_eclipse_repo()["name"]
+            build_success, build_msg = self.build_manager.build_project(project_path)
+            self.workspace_manager.index.record_build(
+                workspace_path, self.build_manager.build_fingerprint(project_path),
+                build_success, build_msg
+            )
+            if not build_success:
+                print(f"[ERROR] Build failed: {build_msg}\n")
+                return False
+            print(f"[OK] Build successful: {build_msg}")
+        else:
+            print("[INFO] Build outputs were not archived; they are rebuilt by the next run")
+        print("")
+        return True
+
+    def write_bundles(self, full=False):
+        """Write or incrementally refresh the bundle of every configured repository"""
+        print("\n" + "=" * 70)
+        print("  UPDATING OFFLINE BUNDLE CACHE")
+        print("=" * 70 + "\n")
+
+        bundle_manager = self.workspace_manager.bundle_manager
+        repos = self.config.repositories
+        print(f"Bundle cache: {bundle_manager.cache_root}\n")
+
+        workers = min(self.config.clone_concurrency, len(repos))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(
+                lambda repo: bundle_manager.write_bundle(repo["url"], full=full), repos
+            ))
+
+        all_ok = True
+        for repo, (success, message) in zip(repos, outcomes):
+            if success:
+                print(f"[OK] {repo['name']}: {message}")
+            else:
+                print(f"[FAIL] {repo['name']}: {message}")
+                all_ok = False
+
+        print("")
+        return all_ok
+
+    def in_prefetch_window(self, now):
+        """Check if PREFETCH_WINDOW (if any) allows fetching at now"""
+        window = self.config.prefetch_window
+        if window is None:
+            return True
+        start, end = window
+        minute = now.hour * 60 + now.minute
+        if start <= end:
+            return start <= minute < end
+        # Window spanning midnight, e.g. 22:00-06:00
+        return minute >= start or minute < end
+
+    def prefetch(self, once=False):
+        """Periodically fetch every repository into the local caches at low priority"""
+        print("\n" + "=" * 70)
+        print("  PREFETCHING REPOSITORIES")
+        print("=" * 70 + "\n")
+
+        if not self.config.use_mirror_cache and any(
+            repo.get("mode") not in ("worktree", "shared") for repo in self.config.repositories
+        ):
+            print("[WARNING] USE_MIRROR_CACHE is off, clones will not use the prefetched mirrors\n")
+
+        lower_process_priority()
+        if not once:
+            print(f"Fetching every {self.config.prefetch_interval} minute(s), "
+                  f"press Ctrl+C to stop\n")
+
+        while True:
+            all_ok = True
+            if once or self.in_prefetch_window(datetime.now()):
+                results = self.workspace_manager.prefetch_repositories()
+                stamp = datetime.now().strftime("%H:%M:%S")
+                for result in results:
+                    if result["success"]:
+                        print(f"[{stamp}] [OK] {result['repo']} ({result['seconds']:.1f}s)")
+                    else:
+                        print(f"[{stamp}] [FAIL] {result['repo']} - {result['result']}")
+                        all_ok = False
+                print("")
+            else:
+                print(f"[{datetime.now():%H:%M:%S}] [INFO] Outside PREFETCH_WINDOW, skipping")
+
+            if once:
+                return all_ok
+            time.sleep(self.config.prefetch_interval * 60)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="One-click workspace setup: clone, configure Eclipse, build and deploy"
+    )
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("run", help="Create or select a workspace and set it up (default)")
+
+    bundle = commands.add_parser(
+        "bundle", help="Write or refresh the offline git bundle cache for every repository"
+    )
+    bundle.add_argument(
+        "--full", action="store_true", help="Rebuild bundles from scratch instead of appending"
+    )
+
+    prefetch = commands.add_parser(
+        "prefetch", help="Keep mirrors and central clones fetched on a schedule (low priority)"
+    )
+    prefetch.add_argument(
+        "--once", action="store_true", help="Fetch every repository once and exit"
+    )
+
+    golden = commands.add_parser(
+        "golden", help="Keep the golden workspace cloned, configured and built on a schedule"
+    )
+    golden.add_argument(
+        "--once", action="store_true", help="Build the golden workspace once and exit"
+    )
+    golden.add_argument(
+        "--full", action="store_true",
+        help="Clone from scratch instead of refreshing the current golden workspace"
+    )
+
+    prune = commands.add_parser(
+        "prune", help="Delete old workspaces by retention policy and compact shared stores"
+    )
+    prune.add_argument("--keep-last", type=int, help="Number of newest workspaces to keep")
+    prune.add_argument(
+        "--max-age-days", type=int, help="Keep workspaces used within this many days (0 = off)"
+    )
+    prune.add_argument(
+        "--budget-gb", type=float, help="Prune oldest workspaces until under this size (0 = off)"
+    )
+    prune.add_argument(
+        "--dry-run", action="store_true", help="Show what would be pruned without deleting"
+    )
+
+    usage = commands.add_parser(
+        "usage", help="Show disk usage per workspace, repository, .git, build/ and .metadata"
+    )
+    usage.add_argument(
+        "--rescan", action="store_true", help="Ignore the cached results of earlier reports"
+    )
+
+    archive = commands.add_parser(
+        "archive", help="Archive a workspace into ARCHIVE_DIR, one archive per repository"
+    )
+    archive.add_argument("workspace", help="Workspace name (e.g. workspace_v3) or path")
+    archive.add_argument(
+        "--remove", action="store_true", help="Delete the workspace once it is archived"
+    )
+
+    restore = commands.add_parser(
+        "restore", help="Restore an archived workspace (lists the archives without a name)"
+    )
+    restore.add_argument("name", nargs="?", help="Archive name, usually the workspace name")
+    restore.add_argument(
+        "--rebuild", action="store_true", help="Build the project right after restoring"
+    )
+    return parser.parse_args()
+
 
 def main():
     """Main entry point"""
+    args = parse_args()
     try:
         automation = WorkspaceAutomation()
-        success = automation.run()
+        if automation.config.ssh_multiplex:
+            start_ssh_multiplexing(automation.config.ssh_control_persist)
+        try:
+            if args.command == "bundle":
+                success = automation.write_bundles(full=args.full)
+            elif args.command == "prefetch":
+                success = automation.prefetch(once=args.once)
+            elif args.command == "prune":
+                config = automation.config
+                success = automation.prune(
+                    config.prune_keep_last if args.keep_last is None else args.keep_last,
+                    config.prune_max_age_days if args.max_age_days is None
+                    else args.max_age_days,
+                    config.prune_disk_budget_gb if args.budget_gb is None else args.budget_gb,
+                    dry_run=args.dry_run,
+                )
+            elif args.command == "usage":
+                success = automation.report_usage(rescan=args.rescan)
+            elif args.command == "archive":
+                success = automation.archive_workspace(args.workspace, remove=args.remove)
+            elif args.command == "restore":
+                success = automation.restore_workspace(args.name, rebuild=args.rebuild)
+            elif args.command == "golden":
+                success = automation.build_golden(once=args.once, full=args.full)
+            else:
+                success = automation.run()
+        finally:
+            stop_ssh_multiplexing()
 
         if success:
             sys.exit(0)
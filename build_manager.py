@@ -2,10 +2,20 @@
 Build Manager - Handles Gradle builds and application deployment
 """
 import os
+import hashlib
 import subprocess
 from pathlib import Path
 import logging
 
+from repo_state import read_repo_state
+
+
+# Files whose changes invalidate a previous build of the same commit
+BUILD_INPUT_FILES = (
+    'build.gradle', 'build.gradle.kts', 'settings.gradle', 'settings.gradle.kts',
+    'gradle.properties', 'gradle/wrapper/gradle-wrapper.properties',
+)
+
 
 class BuildManager:
     """Manages build operations and application deployment"""
@@ -22,6 +32,18 @@ class BuildManager:
         else:
             return None
     
+    def build_fingerprint(self, project_path):
+        """Fingerprint of the build inputs: commit, build scripts and Java version"""
+        state = read_repo_state(project_path)
+        digest = hashlib.sha1()
+        digest.update(f"{state.head_sha}|java={self.config.java_version}".encode("utf-8"))
+        for name in BUILD_INPUT_FILES:
+            build_file = project_path / name
+            if build_file.is_file():
+                stat = build_file.stat()
+                digest.update(f"|{name}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+        return digest.hexdigest()
+
     def build_gradle_project(self, project_path):
         """Build Gradle project"""
         self.logger.info(f"Building Gradle project: {project_path}")
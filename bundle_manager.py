@@ -0,0 +1,132 @@
+"""
+Bundle Manager - Offline git bundle cache used to bootstrap clones without the Git server
+"""
+
+import json
+import logging
+import os
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+from file_lock import FileLock
+from git_utils import git_env, run_git, last_error_line, repo_slug
+from mirror_manager import MirrorManager
+
+
+class BundleManager:
+    """Writes incremental git bundles per repository and locates them for cloning"""
+
+    INDEX_FILE = "bundles.json"
+
+    def __init__(self, config, mirror_manager=None):
+        """Initialize bundle manager with configuration"""
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.mirror_manager = mirror_manager or MirrorManager(config)
+
+    @property
+    def cache_root(self):
+        """Directory holding the bundles of every repository"""
+        return Path(self.config.workspace_base_path) / self.config.bundle_cache_dir
+
+    def bundle_dir(self, url):
+        """Directory holding the bundle chain of one repository URL"""
+        return self.cache_root / repo_slug(url)
+
+    def _read_index(self, url):
+        """Load the bundle chain description, or an empty one"""
+        index_file = self.bundle_dir(url) / self.INDEX_FILE
+        try:
+            with open(index_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"url": url, "bundles": []}
+
+    def _write_index(self, url, index):
+        """Atomically replace the bundle chain description"""
+        index_file = self.bundle_dir(url) / self.INDEX_FILE
+        tmp_file = index_file.with_name(f"{index_file.name}.tmp-{os.getpid()}")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_file, index_file)
+
+    def get_bundles(self, url):
+        """Ordered bundle files to replay for url, base bundle first"""
+        index = self._read_index(url)
+        bundle_dir = self.bundle_dir(url)
+        bundles = [bundle_dir / entry["file"] for entry in index.get("bundles", [])]
+        if not bundles or not all(bundle.exists() for bundle in bundles):
+            return []
+        return bundles
+
+    def write_bundle(self, url, full=False):
+        """Create the base bundle or append an incremental one for url"""
+        success, result = self.mirror_manager.update_mirror(url)
+        if not success:
+            mirror = self.mirror_manager.get_mirror(url)
+            if mirror is None:
+                return False, result
+            self.logger.warning(f"{result} - bundling the existing mirror")
+        else:
+            mirror = result
+
+        bundle_dir = self.bundle_dir(url)
+        bundle_dir.mkdir(parents=True, exist_ok=True)
+        # bundles.json is read, extended and written back; two bundle runs
+        # must not both append the same bundle number.
+        with FileLock(bundle_dir.with_name(f"{bundle_dir.name}.lock")):
+            return self._append_bundle(url, mirror, bundle_dir, full)
+
+    def _append_bundle(self, url, mirror, bundle_dir, full):
+        """Write the next bundle of the chain and record it in the index"""
+        index = self._read_index(url)
+        if full or not self.get_bundles(url):
+            for entry in index.get("bundles", []):
+                (bundle_dir / entry["file"]).unlink(missing_ok=True)
+            index = {"url": url, "bundles": []}
+
+        # Everything already bundled is excluded, so each new bundle holds
+        # only the commits added upstream since the previous one.
+        known = sorted({
+            sha for entry in index["bundles"] for sha in entry["refs"].values()
+        })
+        number = len(index["bundles"]) + 1
+        bundle_file = bundle_dir / f"{number:04d}.bundle"
+        tmp_file = bundle_dir / f"{number:04d}.bundle.tmp-{os.getpid()}"
+
+        result = self._run_bundle_create(mirror, tmp_file, known)
+        if result.returncode != 0:
+            tmp_file.unlink(missing_ok=True)
+            if "empty bundle" in result.stderr:
+                return True, "Up to date"
+            return False, f"Bundle creation failed: {last_error_line(result.stderr)}"
+
+        heads = run_git(["bundle", "list-heads", str(tmp_file)])
+        refs = {}
+        for line in heads.stdout.splitlines():
+            sha, _, ref = line.partition(" ")
+            if ref:
+                refs[ref] = sha
+
+        os.replace(tmp_file, bundle_file)
+        index["bundles"].append({
+            "file": bundle_file.name,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "refs": refs,
+        })
+        self._write_index(url, index)
+
+        kind = "base" if number == 1 else "incremental"
+        return True, f"Wrote {kind} bundle {bundle_file.name} ({len(refs)} ref(s))"
+
+    def _run_bundle_create(self, mirror, bundle_file, exclude):
+        """Run git bundle create, passing exclusions on stdin"""
+        return subprocess.run(
+            ["git", "--git-dir", str(mirror), "bundle", "create", "--quiet",
+             str(bundle_file), "HEAD", "--branches", "--tags", "--stdin"],
+            input="".join(f"^{sha}\n" for sha in exclude),
+            capture_output=True,
+            text=True,
+            env=git_env(),
+        )
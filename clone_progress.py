@@ -0,0 +1,242 @@
+"""
+Clone Progress - Parses git progress output and renders one throttled aggregate status line
+"""
+
+import logging
+import re
+import sys
+import threading
+import time
+from collections import namedtuple
+
+
+# One parsed git progress update
+ProgressEvent = namedtuple(
+    "ProgressEvent", ["phase", "percent", "current", "total", "size", "throughput", "done"]
+)
+
+# "Receiving objects:  45% (450/1000), 1.20 MiB | 2.00 MiB/s, done."
+_PERCENT_RE = re.compile(
+    r"^(?:remote: )?(?P<phase>[A-Za-z][A-Za-z ]*?):\s+(?P<percent>\d+)%"
+    r"\s+\((?P<current>\d+)/(?P<total>\d+)\)"
+    r"(?:,\s+(?P<size>[\d.]+ [KMGT]?i?B))?"
+    r"(?:\s+\|\s+(?P<throughput>[\d.]+ [KMGT]?i?B/s))?"
+    r"(?P<done>,\s+done\.?)?"
+)
+
+# "remote: Enumerating objects: 15, done."
+_COUNT_RE = re.compile(
+    r"^(?:remote: )?(?P<phase>[A-Za-z][A-Za-z ]*?):\s+(?P<current>\d+)(?P<done>,\s+done\.?)?$"
+)
+
+# Share of a whole clone spent in each phase, used for the aggregate percentage
+PHASE_WEIGHTS = {
+    "Counting objects": 0.03,
+    "Compressing objects": 0.02,
+    "Receiving objects": 0.70,
+    "Resolving deltas": 0.15,
+    "Updating files": 0.10,
+}
+
+
+def parse_progress_line(line):
+    """Parse one git progress line into a ProgressEvent, or None"""
+    match = _PERCENT_RE.match(line)
+    if match:
+        return ProgressEvent(
+            phase=match.group("phase"),
+            percent=int(match.group("percent")),
+            current=int(match.group("current")),
+            total=int(match.group("total")),
+            size=match.group("size") or "",
+            throughput=match.group("throughput") or "",
+            done=bool(match.group("done")),
+        )
+    match = _COUNT_RE.match(line)
+    if match:
+        return ProgressEvent(
+            phase=match.group("phase"),
+            percent=100 if match.group("done") else 0,
+            current=int(match.group("current")),
+            total=int(match.group("current")),
+            size="",
+            throughput="",
+            done=bool(match.group("done")),
+        )
+    return None
+
+
+def iter_output_records(stream, chunk_size=8192):
+    """Yield lines from a binary stream split on both \\r and \\n"""
+    pending = b""
+    read = getattr(stream, "read1", stream.read)
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        pending += chunk
+        parts = re.split(rb"[\r\n]", pending)
+        pending = parts.pop()
+        for part in parts:
+            if part.strip():
+                yield part.decode("utf-8", errors="replace").rstrip()
+    if pending.strip():
+        yield pending.decode("utf-8", errors="replace").rstrip()
+
+
+def format_duration(seconds):
+    """Format seconds as M:SS or H:MM:SS"""
+    seconds = int(max(0, seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+
+class CloneProgress:
+    """Collects progress events from concurrent clones and renders them at a bounded rate"""
+
+    def __init__(self, refresh_interval=0.5, stream=None):
+        """Initialize the progress display"""
+        self.refresh_interval = refresh_interval
+        self.stream = stream or sys.stdout
+        self.interactive = hasattr(self.stream, "isatty") and self.stream.isatty()
+        # Without a terminal the status line cannot be redrawn in place, so it
+        # is printed as a regular line, much less often.
+        self.min_interval = refresh_interval if self.interactive else max(refresh_interval, 10.0)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._repos = {}
+        self._started_at = None
+        self._last_render = 0.0
+        self._status_width = 0
+
+    def begin(self, repo_names):
+        """Start tracking a batch of repositories"""
+        with self._lock:
+            self._started_at = time.monotonic()
+            self._repos = {name: self._new_state() for name in repo_names}
+
+    @staticmethod
+    def _new_state():
+        """Empty progress state of one repository"""
+        return {"event": None, "phases": {}, "phase_started": {}, "finished": False}
+
+    def _state(self, repo_name):
+        """Per-repo state, registering repos that were not part of begin()"""
+        if self._started_at is None:
+            self._started_at = time.monotonic()
+        if repo_name not in self._repos:
+            self._repos[repo_name] = self._new_state()
+        return self._repos[repo_name]
+
+    def update(self, repo_name, event):
+        """Record a progress event and redraw if the refresh interval elapsed"""
+        with self._lock:
+            state = self._state(repo_name)
+            now = time.monotonic()
+            state["phase_started"].setdefault(event.phase, now)
+            state["event"] = event
+            if event.done or event.percent >= 100:
+                started = state["phase_started"][event.phase]
+                state["phases"][event.phase] = (event, now - started)
+
+            if now - self._last_render >= self.min_interval:
+                self._render(now)
+
+    def write_line(self, text):
+        """Print a regular output line without garbling the status line"""
+        with self._lock:
+            self._clear_status()
+            self.stream.write(text + "\n")
+            self.stream.flush()
+
+    def finish(self, repo_name, success):
+        """Mark a repository done and log its per-phase summary"""
+        with self._lock:
+            state = self._state(repo_name)
+            state["finished"] = True
+            summary = self._summary(state)
+        status = "cloned" if success else "failed"
+        if summary:
+            self.logger.info(f"{repo_name}: {status} - {summary}")
+        else:
+            self.logger.info(f"{repo_name}: {status}")
+
+    def end(self):
+        """Stop tracking and leave the terminal on a fresh line"""
+        with self._lock:
+            if self._repos:
+                self._render(time.monotonic(), final=True)
+            if self.interactive and self._status_width:
+                self.stream.write("\n")
+                self.stream.flush()
+            self._status_width = 0
+            self._repos = {}
+            self._started_at = None
+
+    def _summary(self, state):
+        """One-line summary of every completed phase of a repository"""
+        parts = []
+        for phase, (event, duration) in state["phases"].items():
+            detail = f"{event.total} objects" if "objects" in phase else f"{event.total}"
+            if event.size:
+                detail += f", {event.size}"
+            if event.throughput:
+                detail += f" @ {event.throughput}"
+            parts.append(f"{phase}: {detail} in {duration:.1f}s")
+        return "; ".join(parts)
+
+    def _fraction(self, state):
+        """Estimated completed fraction of one repository's clone"""
+        if state["finished"]:
+            return 1.0
+        fraction = sum(PHASE_WEIGHTS.get(phase, 0.0) for phase in state["phases"])
+        event = state["event"]
+        if event and event.phase not in state["phases"]:
+            fraction += PHASE_WEIGHTS.get(event.phase, 0.0) * event.percent / 100.0
+        return min(fraction, 0.99)
+
+    def _clear_status(self):
+        """Erase the in-place status line on a terminal"""
+        if self.interactive and self._status_width:
+            self.stream.write("\r" + " " * self._status_width + "\r")
+            self._status_width = 0
+
+    def _render(self, now, final=False):
+        """Draw the aggregate status line (caller holds the lock)"""
+        self._last_render = now
+        if not self._repos:
+            return
+
+        fractions = [self._fraction(state) for state in self._repos.values()]
+        overall = sum(fractions) / len(fractions)
+        done = sum(1 for state in self._repos.values() if state["finished"])
+        elapsed = now - (self._started_at or now)
+
+        line = f"  [progress] {done}/{len(self._repos)} repos | {overall * 100:5.1f}%"
+        if final:
+            line += f" | elapsed {format_duration(elapsed)}"
+        elif overall > 0.02:
+            eta = elapsed * (1 - overall) / overall
+            line += f" | ETA {format_duration(eta)}"
+
+        active = [
+            (name, state["event"]) for name, state in self._repos.items()
+            if not state["finished"] and state["event"] is not None
+        ]
+        for name, event in active[:3]:
+            line += f" | {name}: {event.phase} {event.percent}%"
+            if event.throughput:
+                line += f" {event.throughput}"
+        if len(active) > 3:
+            line += f" | +{len(active) - 3} more"
+
+        if self.interactive:
+            self._clear_status()
+            self.stream.write(line)
+            self._status_width = len(line)
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
@@ -4,10 +4,15 @@ Loads and validates configuration from .env file
 """
 
 import os
+import re
 from pathlib import Path
 from dotenv import load_dotenv
 
 
+# How a repository is materialized inside a workspace
+REPO_MODES = ("clone", "worktree", "shared")
+
+
 class Config:
     """Configuration class to manage all settings"""
 
@@ -36,8 +41,84 @@ class Config:
         self.log_dir = self.get_env("LOG_DIR", "logs")
 
         # Repository Configuration
+        self.clone_mode = self.get_env("CLONE_MODE", "clone").strip().lower()
         self.repositories = self._load_repositories()
 
+        # Clone Configuration
+        self.clone_concurrency = max(1, int(self.get_env("CLONE_CONCURRENCY", "4")))
+        # 0 = no per-host limit beyond CLONE_CONCURRENCY
+        self.clone_host_concurrency = max(0, int(self.get_env("CLONE_HOST_CONCURRENCY", "0")))
+        self.clone_retries = max(0, int(self.get_env("CLONE_RETRIES", "2")))
+        self.clone_retry_backoff = float(self.get_env("CLONE_RETRY_BACKOFF", "5"))
+        self.progress_refresh_interval = float(
+            self.get_env("PROGRESS_REFRESH_INTERVAL", "0.5")
+        )
+
+        # Reuse one SSH connection per host for the whole run (not on Windows)
+        self.ssh_multiplex = self.get_bool("SSH_MULTIPLEX", True)
+        self.ssh_control_persist = int(self.get_env("SSH_CONTROL_PERSIST", "60"))
+
+        # Submodules (REPO_N_SUBMODULES=true), updated with this many parallel jobs
+        self.submodule_jobs = max(1, int(self.get_env("SUBMODULE_JOBS", "4")))
+
+        # Git LFS (REPO_N_LFS=true), objects downloaded after checkout
+        self.lfs_concurrency = max(1, int(self.get_env("LFS_CONCURRENCY", "8")))
+
+        # Tune new clones and write commit-graph/multi-pack-index in the background
+        self.post_clone_maintenance = self.get_bool("POST_CLONE_MAINTENANCE", False)
+
+        # Refresh repositories of an existing workspace when it is selected
+        self.refresh_existing_repos = self.get_bool("REFRESH_EXISTING_REPOS", True)
+
+        # Mirror Cache Configuration
+        self.use_mirror_cache = self.get_bool("USE_MIRROR_CACHE", False)
+        self.mirror_cache_dir = self.get_env("MIRROR_CACHE_DIR", ".mirrors")
+        self.mirror_dissociate = self.get_bool("MIRROR_DISSOCIATE", False)
+
+        # Seed clones from the same repository in an existing workspace
+        # (used when the mirror cache is off and no depth/filter is set)
+        self.clone_from_siblings = self.get_bool("CLONE_FROM_SIBLINGS", True)
+
+        # Offline Bundle Cache (written by "python automation.py bundle")
+        self.use_bundle_cache = self.get_bool("USE_BUNDLE_CACHE", True)
+        self.bundle_cache_dir = self.get_env("BUNDLE_CACHE_DIR", ".bundles")
+
+        # Worktree Configuration (CLONE_MODE=worktree or REPO_N_MODE=worktree)
+        self.worktree_store_dir = self.get_env("WORKTREE_STORE_DIR", ".worktrees")
+
+        # Shared read-only checkouts (REPO_N_MODE=shared)
+        self.shared_store_dir = self.get_env("SHARED_STORE_DIR", ".shared")
+
+        # Prefetch loop (python automation.py prefetch)
+        self.prefetch_interval = max(1, int(self.get_env("PREFETCH_INTERVAL", "30")))
+        self.prefetch_window = self._parse_window("PREFETCH_WINDOW")
+
+        # Golden workspace new workspaces are copied from (USE_GOLDEN_WORKSPACE=true)
+        self.use_golden_workspace = self.get_bool("USE_GOLDEN_WORKSPACE", False)
+        self.golden_workspace_path = self.get_env("GOLDEN_WORKSPACE_PATH", "")
+        self.golden_dir = self.get_env("GOLDEN_DIR", ".golden")
+        self.golden_copy_workers = max(1, int(self.get_env("GOLDEN_COPY_WORKERS", "8")))
+        # Golden builder (python automation.py golden)
+        self.golden_interval = max(1, int(self.get_env("GOLDEN_INTERVAL", "240")))
+        self.golden_keep_builds = max(1, int(self.get_env("GOLDEN_KEEP_BUILDS", "2")))
+
+        # Workspace retention (python automation.py prune)
+        self.prune_keep_last = max(0, int(self.get_env("PRUNE_KEEP_LAST", "5")))
+        self.prune_max_age_days = max(0, int(self.get_env("PRUNE_MAX_AGE_DAYS", "14")))
+        self.prune_disk_budget_gb = max(0.0, float(self.get_env("PRUNE_DISK_BUDGET_GB", "0")))
+        self.prune_workers = max(1, int(self.get_env("PRUNE_WORKERS", "4")))
+        # Directories scanned in parallel by the usage report and disk budget
+        self.usage_workers = max(1, int(self.get_env("USAGE_WORKERS", "8")))
+
+        # Workspace archives (python automation.py archive / restore)
+        self.archive_dir = self.get_env("ARCHIVE_DIR", ".archives")
+        self.archive_workers = max(1, int(self.get_env("ARCHIVE_WORKERS", "4")))
+        self.archive_compression = min(9, max(1, int(self.get_env("ARCHIVE_COMPRESSION", "6"))))
+        # Regenerable directories left out of archives when untracked (never inside .git)
+        self.archive_exclude = set(
+            self.get_list("ARCHIVE_EXCLUDE") or ["build", ".gradle", ".cache", "node_modules"]
+        )
+
         # Eclipse Configuration
         self.eclipse_repo_index = (
             int(self.get_env("ECLIPSE_REPO_TO_CONFIGURE", "1")) - 1
@@ -74,7 +155,17 @@ class Config:
                 "url": url,
                 "name": name,
                 "branch": branch,
-                "index": index
+                "index": index,
+                "depth": self._parse_depth(index),
+                "filter": self._parse_filter(index),
+                "single_branch": self.get_bool(f"REPO_{index}_SINGLE_BRANCH", False),
+                "sparse": self.get_list(f"REPO_{index}_SPARSE"),
+                "mode": self._parse_mode(index),
+                "submodules": self.get_bool(f"REPO_{index}_SUBMODULES", False),
+                "shallow_submodules": self.get_bool(f"REPO_{index}_SHALLOW_SUBMODULES", False),
+                "lfs": self.get_bool(f"REPO_{index}_LFS", False),
+                "lfs_include": self.get_list(f"REPO_{index}_LFS_INCLUDE"),
+                "lfs_exclude": self.get_list(f"REPO_{index}_LFS_EXCLUDE"),
             })
             index += 1
 
@@ -85,6 +176,48 @@ class Config:
 
         return repos
 
+    def _parse_depth(self, index):
+        """Parse REPO_N_DEPTH (shallow clone depth, empty = full history)"""
+        value = os.getenv(f"REPO_{index}_DEPTH", "").strip()
+        if not value:
+            return None
+        if not value.isdigit() or int(value) < 1:
+            raise ValueError(f"REPO_{index}_DEPTH must be a positive integer, got '{value}'")
+        return int(value)
+
+    def _parse_filter(self, index):
+        """Parse REPO_N_FILTER (partial clone filter, e.g. blob:none or tree:0)"""
+        value = os.getenv(f"REPO_{index}_FILTER", "").strip()
+        if not value:
+            return ""
+        if not re.fullmatch(r"blob:none|tree:\d+|blob:limit=\d+[kmgKMG]?", value):
+            raise ValueError(
+                f"REPO_{index}_FILTER '{value}' is not supported. "
+                f"Use blob:none, tree:0 or blob:limit=<size>"
+            )
+        return value
+
+    def _parse_mode(self, index):
+        """Parse REPO_N_MODE (clone, worktree or shared), defaulting to CLONE_MODE"""
+        value = os.getenv(f"REPO_{index}_MODE", "").strip().lower() or self.clone_mode
+        if value not in REPO_MODES:
+            raise ValueError(
+                f"REPO_{index}_MODE '{value}' is not supported. "
+                f"Use one of: {', '.join(REPO_MODES)}"
+            )
+        return value
+
+    def _parse_window(self, key):
+        """Parse an HH:MM-HH:MM time window into (start, end) minutes, or None"""
+        value = os.getenv(key, "").strip()
+        if not value:
+            return None
+        match = re.fullmatch(r"(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})", value)
+        if not match or int(match.group(1)) > 23 or int(match.group(3)) > 23:
+            raise ValueError(f"{key} must look like 01:00-06:30, got '{value}'")
+        hours_1, minutes_1, hours_2, minutes_2 = (int(group) for group in match.groups())
+        return hours_1 * 60 + minutes_1, hours_2 * 60 + minutes_2
+
     def get_env(self, key, default=None):
         """Get environment variable with optional default"""
         value = os.getenv(key, default)
@@ -92,6 +225,18 @@ class Config:
             raise ValueError(f"Required configuration '{key}' not found in .env file")
         return value
 
+    def get_list(self, key):
+        """Get comma-separated environment variable as a list"""
+        value = os.getenv(key, "")
+        return [item.strip() for item in value.split(",") if item.strip()]
+
+    def get_bool(self, key, default=False):
+        """Get boolean environment variable (true/yes/1/on)"""
+        value = os.getenv(key)
+        if value is None or value.strip() == "":
+            return default
+        return value.strip().lower() in ("1", "true", "yes", "on")
+
     def get_eclipse_repo(self):
         """Get the repository to configure in Eclipse"""
         if self.eclipse_repo_index >= len(self.repositories):
@@ -113,6 +258,15 @@ class Config:
         if not Path(self.tomcat_home).exists():
             errors.append(f"TOMCAT_HOME path does not exist: {self.tomcat_home}")
 
+        # The Eclipse project is built in place, which a read-only checkout forbids
+        if self.eclipse_repo_index < len(self.repositories):
+            eclipse_repo = self.repositories[self.eclipse_repo_index]
+            if eclipse_repo["mode"] == "shared":
+                errors.append(
+                    f"ECLIPSE_REPO_TO_CONFIGURE points to {eclipse_repo['name']}, "
+                    f"which uses the read-only shared mode"
+                )
+
         # Validate Eclipse Path (optional warning)
         if not Path(self.eclipse_path).exists():
             errors.append(f"Warning: ECLIPSE_PATH does not exist: {self.eclipse_path}")
@@ -0,0 +1,66 @@
+"""
+File Lock - Cross-process advisory lock on a lock file (fcntl on POSIX, msvcrt on Windows)
+"""
+
+import os
+import time
+from pathlib import Path
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """Exclusive lock held on a file for the duration of a with block"""
+
+    def __init__(self, path, timeout=None, poll_interval=0.1):
+        """Create a lock on path; timeout None waits forever"""
+        self.path = Path(path)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._file = None
+
+    def acquire(self, blocking=True):
+        """Acquire the lock, returning False if it is held elsewhere and not blocking"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        handle = open(self.path, "a+b")
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while True:
+            try:
+                if os.name == "nt":
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._file = handle
+                return True
+            except OSError:
+                if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                    handle.close()
+                    if blocking:
+                        raise TimeoutError(f"Timed out waiting for lock: {self.path}")
+                    return False
+                time.sleep(self.poll_interval)
+
+    def release(self):
+        """Release the lock"""
+        if self._file is None:
+            return
+        try:
+            if os.name == "nt":
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
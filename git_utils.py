@@ -0,0 +1,217 @@
+"""
+Git Utilities - Shared helpers for running git subprocesses
+"""
+
+import functools
+import hashlib
+import os
+import re
+import shlex
+import shutil
+import stat
+import subprocess
+import tempfile
+from urllib.parse import urlparse
+
+
+# Directory of the SSH control sockets while multiplexing is active
+_ssh_control_dir = None
+_ssh_control_persist = 60
+
+
+@functools.lru_cache(maxsize=None)
+def configured_ssh_command():
+    """core.sshCommand from the user's git configuration, or None"""
+    try:
+        result = subprocess.run(
+            ["git", "config", "--get", "core.sshCommand"],
+            stdin=subprocess.DEVNULL, capture_output=True, text=True,
+        )
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+def _is_openssh(command):
+    """Check if an ssh command line runs OpenSSH, which accepts -o options"""
+    try:
+        program = shlex.split(command)[0]
+    except (ValueError, IndexError):
+        return False
+    return os.path.splitext(os.path.basename(program))[0].lower() == "ssh"
+
+
+def git_env(extra=None):
+    """Environment for git subprocesses that must never block on a prompt"""
+    env = os.environ.copy()
+    # Credential prompts would hang a worker forever when several git
+    # processes share the terminal; fail fast instead and report the error.
+    env["GIT_TERMINAL_PROMPT"] = "0"
+    # GIT_SSH_COMMAND takes precedence over core.sshCommand, so options are
+    # added to the configured command; other programs are left alone.
+    ssh_command = configured_ssh_command() or "ssh"
+    if "GIT_SSH_COMMAND" not in env and "GIT_SSH" not in env and _is_openssh(ssh_command):
+        ssh_command += " -o BatchMode=yes"
+        # A core.sshCommand with its own ControlMaster/ControlPath keeps its multiplexing
+        if _ssh_control_dir and not re.search(r"control(master|path)", ssh_command, re.I):
+            control_path = shlex.quote(os.path.join(_ssh_control_dir, "%C"))
+            ssh_command += (
+                f" -o ControlMaster=auto -o ControlPath={control_path}"
+                f" -o ControlPersist={_ssh_control_persist}"
+            )
+        env["GIT_SSH_COMMAND"] = ssh_command
+    if extra:
+        env.update(extra)
+    return env
+
+
+def start_ssh_multiplexing(persist_seconds=60):
+    """Let git processes of this run share one SSH connection per host"""
+    global _ssh_control_dir, _ssh_control_persist
+    # OpenSSH on Windows has no ControlMaster support
+    if os.name == "nt" or _ssh_control_dir is not None:
+        return _ssh_control_dir
+    _ssh_control_persist = int(persist_seconds)
+    # Socket paths are limited to ~100 characters, so keep the directory short
+    _ssh_control_dir = tempfile.mkdtemp(prefix="wsa-ssh-")
+    return _ssh_control_dir
+
+
+def stop_ssh_multiplexing():
+    """Close the shared SSH connections and remove their sockets"""
+    global _ssh_control_dir
+    control_dir, _ssh_control_dir = _ssh_control_dir, None
+    if control_dir is None:
+        return
+    for name in os.listdir(control_dir):
+        try:
+            subprocess.run(
+                ["ssh", "-o", f"ControlPath={os.path.join(control_dir, name)}",
+                 "-O", "exit", "multiplexed-host"],
+                stdin=subprocess.DEVNULL, capture_output=True, timeout=10,
+            )
+        except (OSError, subprocess.SubprocessError):
+            pass
+    shutil.rmtree(control_dir, ignore_errors=True)
+
+
+def lower_process_priority():
+    """Run this process and the git processes it starts at background priority"""
+    if os.name == "nt":
+        import ctypes
+        below_normal_priority_class = 0x4000
+        kernel32 = ctypes.windll.kernel32
+        kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), below_normal_priority_class)
+        return
+    os.nice(10)
+    # Idle I/O class: disk access only when nothing else needs it (Linux)
+    if shutil.which("ionice"):
+        subprocess.run(["ionice", "-c", "3", "-p", str(os.getpid())],
+                       stdin=subprocess.DEVNULL, capture_output=True)
+
+
+def url_host(url):
+    """Host a repository URL points to, or "local" for file URLs and paths"""
+    if "://" in url:
+        parsed = urlparse(url)
+        if parsed.scheme == "file" or not parsed.hostname:
+            return "local"
+        return f"{parsed.hostname}:{parsed.port}" if parsed.port else parsed.hostname
+    # scp-like syntax: [user@]host:path (a single letter is a Windows drive)
+    match = re.match(r"^(?:[^@/]+@)?([^:/\\]+):", url)
+    if match and len(match.group(1)) > 1:
+        return match.group(1).lower()
+    return "local"
+
+
+def run_git(args, cwd=None, env=None):
+    """Run a git command non-interactively and capture its output"""
+    return subprocess.run(
+        ["git"] + list(args),
+        cwd=str(cwd) if cwd else None,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+        env=env or git_env(),
+    )
+
+
+# Failure classes worth retrying; auth, certificate, disk and
+# missing-repository errors fail the same way every time.
+RETRYABLE_ERRORS = ("network", "unknown")
+
+# Regular expressions matched against lowercased git output, first match wins.
+# HTTP status codes only count where git or curl reports them, so a "403" in a
+# URL, path or commit hash is not mistaken for one.
+_ERROR_PATTERNS = (
+    ("auth", (r"authentication failed", r"permission denied", r"could not read username",
+              r"could not read password", r"terminal prompts disabled",
+              r"invalid username or password", r"access denied",
+              r"returned error: 40[13]\b", r"\bhttp 40[13]\b",
+              r"host key verification failed")),
+    ("certificate", (r"ssl certificate problem", r"certificate verify failed",
+                     r"server certificate verification failed",
+                     r"self[- ]signed certificate", r"unable to get local issuer certificate",
+                     r"certificate has expired")),
+    ("disk", (r"no space left on device", r"disk quota exceeded", r"read-only file system",
+              r"cannot allocate memory", r"out of memory")),
+    ("missing", (r"repository not found", r"does not appear to be a git repository",
+                 r"not found in upstream", r"returned error: 404\b", r"\bhttp 404\b")),
+    ("network", (r"could not resolve host", r"connection timed out", r"connection refused",
+                 r"connection reset", r"early eof", r"rpc failed", r"remote end hung up",
+                 r"operation timed out", r"network is unreachable", r"unable to access",
+                 r"\bssl\b", r"\btls\b", r"broken pipe",
+                 r"transfer closed", r"http/2 stream")),
+)
+_ERROR_REGEXES = tuple(
+    (kind, re.compile("|".join(patterns))) for kind, patterns in _ERROR_PATTERNS
+)
+
+
+def classify_git_error(output):
+    """Classify git failure output as auth, certificate, disk, missing, network or unknown"""
+    if isinstance(output, (list, tuple)):
+        output = "\n".join(output)
+    text = (output or "").lower()
+    for kind, regex in _ERROR_REGEXES:
+        if regex.search(text):
+            return kind
+    return "unknown"
+
+
+def force_rmtree(path, ignore_errors=True):
+    """Remove a directory tree, including git's read-only object files"""
+    def make_writable(func, target, _exc_info):
+        os.chmod(target, stat.S_IWRITE)
+        func(target)
+
+    try:
+        shutil.rmtree(path, onerror=make_writable)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        if not ignore_errors:
+            raise
+
+
+def last_error_line(output):
+    """Return the most relevant line from git's error output"""
+    lines = [line.strip() for line in (output or "").splitlines() if line.strip()]
+    # git prints the root cause first, follow-up hints after it
+    for prefix in ("fatal:", "error:"):
+        for line in lines:
+            if line.startswith(prefix):
+                return line
+    return lines[-1] if lines else "unknown error"
+
+
+def repo_slug(url):
+    """Filesystem-safe, collision-free directory name for a repository URL"""
+    stem = url.rstrip("/").split("/")[-1].split(":")[-1]
+    if stem.endswith(".git"):
+        stem = stem[:-4]
+    stem = re.sub(r"[^A-Za-z0-9._-]", "_", stem) or "repo"
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:10]
+    return f"{stem}-{digest}"
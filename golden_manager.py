@@ -0,0 +1,244 @@
+"""
+Golden Manager - Instantiates new workspaces from a prebuilt golden workspace
+"""
+
+import errno
+import logging
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from git_utils import force_rmtree
+from shared_manager import is_link, remove_link, replace_link
+from workspace_index import WorkspaceIndex
+
+if sys.platform.startswith("linux"):
+    import fcntl
+elif sys.platform == "darwin":
+    import ctypes
+
+
+# ioctl request cloning the extents of one file into another (btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+# Errors meaning the filesystem cannot reflink at all, not just this file
+_NO_REFLINK_ERRORS = (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS)
+
+
+def reflink(source, target):
+    """Create target as a copy-on-write clone of source, raising OSError if unsupported"""
+    if sys.platform.startswith("linux"):
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            except OSError:
+                dst.close()
+                os.unlink(target)
+                raise
+    elif sys.platform == "darwin":
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(source), os.fsencode(target), 0) != 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), str(target))
+    else:
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported on this platform")
+    shutil.copystat(source, target)
+
+
+def is_immutable(relative_parts):
+    """Files that are never modified in place and can be shared as hardlinks"""
+    if ".git" in relative_parts:
+        rest = relative_parts[relative_parts.index(".git") + 1:]
+        # Loose objects and packs; objects/info holds mutable metadata
+        return len(rest) >= 3 and rest[0] == "objects" and rest[1] != "info"
+    return relative_parts[-1].endswith(".jar") and ".gradle" in relative_parts
+
+
+def is_runtime_lock(relative_parts):
+    """Lock files of processes using a workspace, unlike tracked sources such as yarn.lock"""
+    if not relative_parts[-1].endswith(".lock"):
+        return False
+    # Files next to the manifest are the automation's own FileLocks
+    return len(relative_parts) == 1 or any(
+        part in (".git", ".gradle", ".metadata") for part in relative_parts[:-1]
+    )
+
+
+class GoldenManager:
+    """Copies a prebuilt golden workspace into a new workspace as cheaply as the disk allows"""
+
+    def __init__(self, config, index=None):
+        """Initialize golden workspace manager with configuration"""
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.index = index or WorkspaceIndex(config)
+        self._reflink_supported = True
+
+    @property
+    def golden_link(self):
+        """Configured golden workspace (usually a link to the latest good build)"""
+        if self.config.golden_workspace_path:
+            return Path(self.config.golden_workspace_path)
+        return Path(self.config.workspace_base_path) / self.config.golden_dir / "current"
+
+    @property
+    def builds_dir(self):
+        """Directory holding the golden builds the link points to"""
+        return self.golden_link.parent / "builds"
+
+    @property
+    def lock_path(self):
+        """Lock held while a golden workspace is being built"""
+        return self.golden_link.parent / ".lock"
+
+    def new_build_path(self):
+        """Create and return an empty, uniquely named build directory"""
+        self.builds_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        suffix = 0
+        while True:
+            build_path = self.builds_dir / (f"{stamp}_{suffix}" if suffix else stamp)
+            try:
+                build_path.mkdir()
+                return build_path
+            except FileExistsError:
+                suffix += 1
+
+    def publish(self, build_path):
+        """Atomically point the golden link at a successfully built workspace"""
+        self.golden_link.parent.mkdir(parents=True, exist_ok=True)
+        replace_link(Path(build_path).resolve(), self.golden_link)
+
+    def old_builds(self, keep):
+        """Published builds beyond the newest keep ones and unfinished builds
+
+        Never includes the current golden workspace. Call only while holding
+        lock_path, otherwise a build in progress counts as unfinished.
+        """
+        if not self.builds_dir.exists():
+            return []
+        current = Path(os.path.realpath(self.golden_link))
+        published, unfinished = [], []
+        for path in sorted(self.builds_dir.iterdir(), key=lambda p: p.name, reverse=True):
+            if not path.is_dir() or path.resolve() == current:
+                continue
+            steps = self.index.load_manifest(path).get("steps", {})
+            (published if "golden_build" in steps else unfinished).append(path)
+        # The current build occupies one of the kept slots
+        return published[max(keep - 1, 0):] + unfinished
+
+    def get_golden(self):
+        """Resolved golden workspace if it exists and its last build succeeded, else None"""
+        golden = Path(os.path.realpath(self.golden_link))
+        manifest = self.index.load_manifest(golden)
+        if not manifest.get("build", {}).get("success"):
+            return None
+        return golden
+
+    def instantiate(self, workspace_path):
+        """Populate an empty workspace from the golden workspace"""
+        # Resolved once, so a golden rebuild swapped in meanwhile is not mixed in
+        golden = self.get_golden()
+        if golden is None:
+            return False, f"No successfully built golden workspace at {self.golden_link}"
+
+        workspace_path = Path(workspace_path)
+        golden_manifest = self.index.load_manifest(golden)
+        started = time.monotonic()
+        stats = {"reflinked": 0, "hardlinked": 0, "copied": 0, "linked": 0}
+        self._reflink_supported = True
+
+        # Worktrees belong to their central clone and cannot be copied;
+        # they are reported missing and recreated by the normal clone step.
+        skipped_repos = [
+            name for name, info in golden_manifest.get("repos", {}).items()
+            if info.get("mode") == "worktree"
+        ]
+
+        files = []
+        for root, dirs, names in os.walk(golden):
+            relative_root = Path(root).relative_to(golden)
+            if relative_root == Path("."):
+                dirs[:] = [d for d in dirs if d not in skipped_repos]
+            for name in list(dirs):
+                source = Path(root) / name
+                target = workspace_path / relative_root / name
+                if is_link(source):
+                    replace_link(os.readlink(source), target)
+                    stats["linked"] += 1
+                    dirs.remove(name)
+                elif name.endswith(".partial"):
+                    dirs.remove(name)
+                else:
+                    target.mkdir(exist_ok=True)
+            for name in names:
+                # The manifest is rewritten below; lock files (git, Gradle,
+                # Eclipse) belong to processes running in the golden copy.
+                if is_runtime_lock((relative_root / name).parts) or (
+                    name == WorkspaceIndex.MANIFEST_FILE and relative_root == Path(".")
+                ):
+                    continue
+                files.append(relative_root / name)
+
+        def copy(relative):
+            return self._copy_file(golden / relative, workspace_path / relative, relative.parts)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.config.golden_copy_workers) as executor:
+                for method in executor.map(copy, files):
+                    stats[method] += 1
+        except OSError as e:
+            # Leave the workspace empty again so it can be cloned instead
+            for item in workspace_path.iterdir():
+                if is_link(item):
+                    remove_link(item)
+                elif item.is_dir():
+                    force_rmtree(item)
+                elif item.name != WorkspaceIndex.MANIFEST_FILE and not is_runtime_lock((item.name,)):
+                    item.unlink()
+            return False, f"Copying from the golden workspace failed: {str(e)}"
+
+        shas = {name: info.get("sha") for name, info in golden_manifest.get("repos", {}).items()}
+
+        def update(manifest):
+            for key in ("repos", "steps", "build"):
+                if key in golden_manifest:
+                    manifest[key] = golden_manifest[key]
+            for name in skipped_repos:
+                manifest["repos"].pop(name, None)
+            manifest["golden"] = {
+                "source": str(golden),
+                "instantiated_at": datetime.now().isoformat(timespec="seconds"),
+                "repos": shas,
+            }
+
+        self.index.update_manifest(workspace_path, update)
+        stats["seconds"] = time.monotonic() - started
+        return True, stats
+
+    def _copy_file(self, source, target, relative_parts):
+        """Copy one file by reflink, hardlink or plain copy; return the method used"""
+        if os.path.islink(source):
+            os.symlink(os.readlink(source), target)
+            return "linked"
+        if self._reflink_supported:
+            try:
+                reflink(source, target)
+                return "reflinked"
+            except OSError as e:
+                # A full disk or a permission problem would fail a copy as well
+                if e.errno not in _NO_REFLINK_ERRORS:
+                    raise
+                self._reflink_supported = False
+        if is_immutable(relative_parts):
+            try:
+                os.link(source, target)
+                return "hardlinked"
+            except OSError:
+                pass
+        shutil.copy2(source, target)
+        return "copied"
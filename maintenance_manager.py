@@ -0,0 +1,145 @@
+"""
+Maintenance Manager - Post-clone git tuning and background index/graph maintenance
+"""
+
+import logging
+import os
+import shutil
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from git_utils import run_git, last_error_line
+from repo_state import find_common_dir, find_git_dir
+
+
+# Settings that make status, checkout and IDE decorations faster in large repos
+FAST_GIT_SETTINGS = (
+    ("core.untrackedCache", "true"),
+    ("core.preloadIndex", "true"),
+    ("index.threads", "true"),
+    # < 1 uses one checkout worker per logical CPU
+    ("checkout.workers", "0"),
+)
+
+
+class MaintenanceManager:
+    """Tunes freshly cloned repositories and writes their commit-graph and multi-pack-index"""
+
+    def __init__(self, config):
+        """Initialize maintenance manager with configuration"""
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+
+    def configure(self, repo_path):
+        """Apply the fast git settings to a repository (cheap, runs synchronously)"""
+        settings = list(FAST_GIT_SETTINGS)
+        # The built-in fsmonitor daemon exists only on Windows and macOS
+        if os.name == "nt" or sys.platform == "darwin":
+            settings.append(("core.fsmonitor", "true"))
+        for key, value in settings:
+            result = run_git(["config", key, value], cwd=repo_path)
+            if result.returncode != 0:
+                return False, f"Setting {key} failed: {last_error_line(result.stderr)}"
+        return True, "Configured"
+
+    def maintain(self, repo_path):
+        """Write commit-graph and multi-pack-index and prime the untracked cache"""
+        repo_path = Path(repo_path)
+        graph_args = ["commit-graph", "write", "--reachable"]
+        # Bloom filters need every tree; a tree:N partial clone would fetch them lazily
+        _, filter_spec = self._config_value(repo_path, "remote.origin.partialclonefilter")
+        if not filter_spec.startswith("tree:"):
+            graph_args.append("--changed-paths")
+
+        steps = [graph_args]
+        # Clones borrowing from a mirror may have no pack of their own
+        git_dir = find_git_dir(repo_path)
+        pack_dir = find_common_dir(git_dir) / "objects" / "pack" if git_dir else None
+        if pack_dir and any(pack_dir.glob("*.pack")):
+            steps.append(["multi-pack-index", "write"])
+        steps.append(["status", "--porcelain", "--untracked-files=normal"])
+
+        for args in steps:
+            result = run_git(args, cwd=repo_path)
+            if result.returncode != 0:
+                return False, f"git {args[0]} failed: {last_error_line(result.stderr)}"
+        return True, f"Wrote {' and '.join(args[0] for args in steps[:-1])}"
+
+    @staticmethod
+    def _config_value(repo_path, key):
+        """Read one git config value, returning (ok, value)"""
+        result = run_git(["config", "--get", key], cwd=repo_path)
+        return result.returncode == 0, result.stdout.strip()
+
+    def start_background(self, repo_paths):
+        """Run maintain() for repo_paths in a detached low-priority process"""
+        # Worktrees of one central clone share their object store
+        targets, seen = [], set()
+        for repo_path in repo_paths:
+            git_dir = find_git_dir(repo_path)
+            if git_dir is None:
+                continue
+            common_dir = find_common_dir(git_dir).resolve()
+            if common_dir not in seen:
+                seen.add(common_dir)
+                targets.append(str(repo_path))
+        if not targets:
+            return None
+
+        log_dir = Path(self.config.log_dir)
+        log_dir.mkdir(parents=True, exist_ok=True)
+        log_file = log_dir / f'maintenance_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
+
+        cmd = [sys.executable, str(Path(__file__).resolve())] + targets
+        kwargs = {}
+        if os.name == "nt":
+            kwargs["creationflags"] = (
+                subprocess.DETACHED_PROCESS
+                | subprocess.CREATE_NEW_PROCESS_GROUP
+                | subprocess.BELOW_NORMAL_PRIORITY_CLASS
+            )
+        else:
+            kwargs["start_new_session"] = True
+            if shutil.which("ionice"):
+                cmd = ["ionice", "-c", "3"] + cmd
+
+        with open(log_file, "a", encoding="utf-8") as log:
+            process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                cwd=str(Path(__file__).parent),
+                **kwargs,
+            )
+        self.logger.info(
+            f"Background maintenance of {len(targets)} repository(ies) "
+            f"started (pid {process.pid}), log: {log_file}"
+        )
+        return process
+
+
+def main(repo_paths):
+    """Entry point of the background maintenance process"""
+    if hasattr(os, "nice"):
+        os.nice(10)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s | %(message)s")
+    logger = logging.getLogger("maintenance")
+
+    # Runs without a Config: only the git commands are needed here
+    manager = MaintenanceManager(config=None)
+    failures = 0
+    for repo_path in repo_paths:
+        success, message = manager.maintain(repo_path)
+        if success:
+            logger.info(f"{repo_path}: {message}")
+        else:
+            logger.warning(f"{repo_path}: {message}")
+            failures += 1
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,85 @@
+"""
+Mirror Manager - Maintains a shared cache of bare mirrors, one per repository URL
+"""
+
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+
+from file_lock import FileLock
+from git_utils import run_git, last_error_line, repo_slug
+
+
+class MirrorManager:
+    """Manages the central bare-mirror object cache shared by all workspaces"""
+
+    def __init__(self, config):
+        """Initialize mirror manager with configuration"""
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    @property
+    def mirror_root(self):
+        """Directory holding every mirror"""
+        return Path(self.config.workspace_base_path) / self.config.mirror_cache_dir
+
+    def mirror_path(self, url):
+        """Location of the mirror for a repository URL"""
+        return self.mirror_root / f"{repo_slug(url)}.git"
+
+    def get_mirror(self, url):
+        """Return the mirror path if a usable mirror exists, else None"""
+        path = self.mirror_path(url)
+        if (path / "HEAD").exists():
+            return path
+        return None
+
+    def _lock_for(self, url):
+        """Serialize updates of the same mirror between worker threads"""
+        with self._locks_guard:
+            return self._locks.setdefault(url, threading.Lock())
+
+    def update_mirror(self, url):
+        """Create the mirror for url or fetch new objects into it"""
+        path = self.mirror_path(url)
+        # The file lock keeps automation runs and the prefetch loop from
+        # updating the same mirror at once; readers need no lock.
+        with self._lock_for(url), FileLock(path.with_name(f"{path.name}.lock")):
+            if (path / "HEAD").exists():
+                return self._fetch_mirror(url, path)
+            return self._create_mirror(url, path)
+
+    def _create_mirror(self, url, path):
+        """Clone a new bare mirror, publishing it only once complete"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        staging = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+        shutil.rmtree(staging, ignore_errors=True)
+
+        self.logger.info(f"Creating mirror for {url}: {path}")
+        result = run_git(["clone", "--mirror", "--quiet", url, str(staging)])
+        if result.returncode != 0:
+            shutil.rmtree(staging, ignore_errors=True)
+            return False, f"Mirror clone failed: {last_error_line(result.stderr)}"
+
+        # Workspaces borrow objects from the mirror through alternates, so
+        # it must never prune objects that a workspace may still reference.
+        run_git(["--git-dir", str(staging), "config", "gc.pruneExpire", "never"])
+
+        try:
+            os.replace(staging, path)
+        except OSError:
+            # Another process published the same mirror first
+            shutil.rmtree(staging, ignore_errors=True)
+        return True, path
+
+    def _fetch_mirror(self, url, path):
+        """Bring an existing mirror up to date with its remote"""
+        self.logger.info(f"Updating mirror for {url}")
+        result = run_git(["--git-dir", str(path), "fetch", "--prune", "--quiet", "origin"])
+        if result.returncode != 0:
+            return False, f"Mirror update failed: {last_error_line(result.stderr)}"
+        return True, path
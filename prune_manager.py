@@ -0,0 +1,318 @@
+"""
+Prune Manager - Retention policy for old workspaces and compaction of the shared git stores
+"""
+
+import logging
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from file_lock import FileLock
+from git_utils import force_rmtree, run_git, last_error_line
+from repo_state import read_repo_state
+from shared_manager import is_link, remove_link
+from usage_manager import UsageManager
+
+
+class PruneManager:
+    """Decides which workspaces to delete, deletes them and compacts what they used"""
+
+    TRASH_DIR = ".trash"
+    LOCK_FILE = ".prune.lock"
+
+    def __init__(self, config, workspace_manager):
+        """Initialize prune manager with configuration"""
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.workspace_manager = workspace_manager
+        self.index = workspace_manager.index
+        self.usage_manager = UsageManager(config)
+
+    @property
+    def base_path(self):
+        """Directory containing all workspaces"""
+        return Path(self.config.workspace_base_path)
+
+    @property
+    def trash_root(self):
+        """Workspaces moved here are already gone and only wait to be deleted"""
+        return self.base_path / self.TRASH_DIR
+
+    def lock(self):
+        """Lock keeping two prune runs from deleting at the same time"""
+        return FileLock(self.base_path / self.LOCK_FILE)
+
+    def plan(self, keep_last, max_age_days, budget_bytes=0):
+        """Decide for every workspace whether it is kept or pruned, and why
+
+        A workspace is kept if it is one of the keep_last newest or was used
+        within max_age_days. If the workspaces then still take more than
+        budget_bytes, the oldest remaining ones are pruned as well. Workspaces
+        with local work or a running application are never pruned.
+        """
+        workspaces = [path for path in self.index.list_workspaces() if path.is_dir()]
+        if not workspaces:
+            return []
+
+        processes = self._process_paths()
+        deployed = self._deployed_workspace() if self._tomcat_running() else None
+        golden = Path(os.path.realpath(self.workspace_manager.golden_manager.golden_link))
+        now = time.time()
+
+        entries = []
+        for position, path in enumerate(reversed(workspaces)):
+            age_days = (now - self._last_used(path)) / 86400
+            reason = self._protection(path, processes, deployed, golden)
+            if reason is None and position == 0:
+                reason = "newest workspace"
+            entry = {"path": path, "age_days": age_days, "size": None,
+                     "prune": False, "protected": reason is not None, "reason": reason}
+            if not entry["protected"]:
+                if position < keep_last:
+                    entry["reason"] = f"one of the last {keep_last}"
+                elif max_age_days and age_days < max_age_days:
+                    entry["reason"] = f"used within {max_age_days} day(s)"
+                else:
+                    entry.update(prune=True, reason="retention policy")
+            entries.append(entry)
+
+        if budget_bytes:
+            usage = self.usage_manager.measure(workspaces)
+            for entry in entries:
+                entry["size"] = usage[os.path.abspath(entry["path"])]["total"]
+
+            total = sum(entry["size"] for entry in entries if not entry["prune"])
+            # Retention only decides the order: oldest kept workspaces go first
+            for entry in reversed(entries):
+                if total <= budget_bytes:
+                    break
+                if entry["prune"] or entry["protected"]:
+                    continue
+                entry["prune"] = True
+                entry["reason"] = "over disk budget"
+                total -= entry["size"]
+
+        return list(reversed(entries))
+
+    def _protection(self, workspace_path, processes, deployed, golden):
+        """Reason a workspace must never be pruned, or None"""
+        resolved = Path(os.path.realpath(workspace_path))
+        if resolved == golden:
+            return "golden workspace"
+        if deployed is not None and resolved == deployed:
+            return "deployed to the running Tomcat"
+        for pid, paths in processes.items():
+            if any(path == resolved or resolved in path.parents for path in paths):
+                return f"in use by process {pid}"
+
+        worktree_manager = self.workspace_manager.worktree_manager
+        for item in sorted(workspace_path.iterdir()):
+            # Shared checkouts are read-only and not owned by the workspace
+            state = read_repo_state(item)
+            if is_link(item) or not state.complete:
+                continue
+            # Untracked files include the Eclipse files the automation writes
+            result = run_git(["status", "--porcelain", "--untracked-files=no"], cwd=item)
+            if result.returncode != 0:
+                return f"{item.name}: cannot read git status"
+            if result.stdout.strip():
+                return f"{item.name}: uncommitted changes"
+            if state.is_worktree:
+                # Other branches of the central clone outlive this workspace;
+                # only those recorded for it are deleted along with it.
+                refs = ["HEAD"] + [
+                    f"refs/heads/{branch}" for branch, owner in
+                    worktree_manager.workspace_branches(state.common_dir).items()
+                    if owner == workspace_path.name
+                ]
+            else:
+                refs = ["HEAD", "--branches"]
+            result = run_git(["rev-list", "--count"] + refs + ["--not", "--remotes"], cwd=item)
+            if result.returncode == 0 and result.stdout.strip() not in ("", "0"):
+                return f"{item.name}: {result.stdout.strip()} unpushed commit(s)"
+        return None
+
+    def _last_used(self, workspace_path):
+        """Time a workspace was last set up, refreshed or built"""
+        manifest = self.index.load_manifest(workspace_path)
+        for key in ("updated", "created"):
+            if manifest.get(key):
+                try:
+                    return datetime.fromisoformat(manifest[key]).timestamp()
+                except ValueError:
+                    pass
+        return workspace_path.stat().st_mtime
+
+    def _tomcat_running(self):
+        """Check if something accepts connections on the Tomcat port"""
+        try:
+            with socket.create_connection(("localhost", int(self.config.tomcat_port)), timeout=1):
+                return True
+        except (OSError, ValueError):
+            return False
+
+    def _deployed_workspace(self):
+        """Workspace whose WAR was deployed to Tomcat most recently, or None"""
+        latest, latest_path = "", None
+        for path in self.index.list_workspaces():
+            deployments = self.index.load_manifest(path).get("deployments", [])
+            if deployments and deployments[-1].get("deployed_at", "") > latest:
+                latest, latest_path = deployments[-1]["deployed_at"], path
+        return Path(os.path.realpath(latest_path)) if latest_path else None
+
+    @staticmethod
+    def _process_paths():
+        """Working directory and path arguments of every running process (Linux only)"""
+        processes = {}
+        proc = Path("/proc")
+        if not proc.is_dir():
+            return processes
+        for entry in proc.iterdir():
+            if not entry.name.isdigit():
+                continue
+            paths = []
+            try:
+                paths.append(Path(os.readlink(entry / "cwd")))
+                arguments = (entry / "cmdline").read_bytes().split(b"\0")
+            except OSError:
+                # Process exited or belongs to another user
+                if paths:
+                    processes[int(entry.name)] = paths
+                continue
+            for argument in arguments:
+                # Covers -Dcatalina.base=<workspace>/... as well as plain paths
+                value = os.fsdecode(argument).split("=", 1)[-1]
+                if os.path.isabs(value):
+                    paths.append(Path(value))
+            processes[int(entry.name)] = paths
+        processes.pop(os.getpid(), None)
+        return processes
+
+    def move_to_trash(self, workspace_path):
+        """Take a workspace out of use in one rename; deletion happens later"""
+        workspace_path = Path(workspace_path)
+        self.trash_root.mkdir(parents=True, exist_ok=True)
+        target = self.trash_root / f"{workspace_path.name}.{int(time.time() * 1000)}"
+        os.replace(workspace_path, target)
+        # Only a workspace that is really gone leaves the index
+        self.index.remove_workspace(workspace_path)
+        return target
+
+    def empty_trash(self):
+        """Delete everything in the trash in parallel, including leftovers of interrupted runs"""
+        if not self.trash_root.exists():
+            return []
+        items = sorted(self.trash_root.iterdir())
+        if not items:
+            return []
+
+        def delete(item):
+            try:
+                if item.is_dir() and not is_link(item):
+                    for child in item.iterdir():
+                        # Never follow links into shared checkouts
+                        if is_link(child):
+                            remove_link(child)
+                    force_rmtree(item, ignore_errors=False)
+                else:
+                    os.unlink(item)
+                return item, True, "Deleted"
+            except OSError as e:
+                return item, False, str(e)
+
+        with ThreadPoolExecutor(max_workers=self.config.prune_workers) as executor:
+            return list(executor.map(delete, items))
+
+    def collect_garbage(self):
+        """Compact central clones and mirrors and drop unused shared checkouts"""
+        messages = []
+        worktree_manager = self.workspace_manager.worktree_manager
+        mirror_manager = self.workspace_manager.mirror_manager
+
+        # Registrations and branches of worktrees in trashed workspaces go first
+        worktree_manager.prune_all()
+        if worktree_manager.store_root.exists():
+            live = self._live_names()
+            for central in sorted(worktree_manager.store_root.glob("*.git")):
+                if not (central / "HEAD").exists():
+                    continue
+                # Only branches add_worktree recorded for a workspace are deleted;
+                # a workspace being set up right now already has its directory.
+                stale = worktree_manager.stale_branches(central, live)
+                deleted = sum(worktree_manager.delete_branch(central, branch) for branch in stale)
+                if deleted:
+                    messages.append((True, f"{central.name}: deleted {deleted} stale branch(es)"))
+                messages.append(self._compact(central, ["gc", "--quiet"]))
+
+        if mirror_manager.mirror_root.exists():
+            for mirror in sorted(mirror_manager.mirror_root.glob("*.git")):
+                if (mirror / "HEAD").exists():
+                    # Clones borrow objects from mirrors through alternates,
+                    # so unreachable objects are kept (-k), only repacked.
+                    messages.append(self._compact(mirror, ["repack", "-a", "-d", "-k", "-q"]))
+
+        messages.extend(self._prune_shared_checkouts())
+        return messages
+
+    def _live_names(self):
+        """Names of every workspace and golden build directory that still exists"""
+        names = {path.name for path in self.index.list_workspaces()}
+        for parent in (self.base_path, self.workspace_manager.golden_manager.builds_dir):
+            if parent.is_dir():
+                names.update(path.name for path in parent.iterdir())
+        return names
+
+    @staticmethod
+    def _compact(git_dir, args):
+        """Run a compaction command under the lock the store is updated with"""
+        with FileLock(git_dir.with_name(f"{git_dir.name}.lock")):
+            result = run_git(["--git-dir", str(git_dir)] + args)
+        if result.returncode != 0:
+            return False, f"{git_dir.name}: git {args[0]} failed: {last_error_line(result.stderr)}"
+        return True, f"{git_dir.name}: compacted (git {args[0]})"
+
+    def _referenced_checkouts(self):
+        """Shared checkouts linked from any workspace or golden build"""
+        roots = list(self.index.list_workspaces())
+        builds_dir = self.workspace_manager.golden_manager.builds_dir
+        if builds_dir.exists():
+            roots.extend(builds_dir.iterdir())
+        referenced = set()
+        for root in roots:
+            if not root.is_dir():
+                continue
+            for item in root.iterdir():
+                if is_link(item):
+                    referenced.add(Path(os.path.realpath(item)))
+        return referenced
+
+    def _prune_shared_checkouts(self):
+        """Remove shared checkouts that no workspace links to and that are not current"""
+        shared_manager = self.workspace_manager.shared_manager
+        if not shared_manager.store_root.exists():
+            return []
+        referenced = self._referenced_checkouts()
+        messages = []
+        for repo_dir in sorted(shared_manager.store_root.iterdir()):
+            if not repo_dir.is_dir() or is_link(repo_dir):
+                continue
+            with FileLock(repo_dir / ".lock"):
+                current_link = repo_dir / shared_manager.CURRENT_LINK
+                current = Path(os.path.realpath(current_link)) if is_link(current_link) else None
+                for checkout in sorted(repo_dir.glob("checkout-*")):
+                    if checkout.name.endswith(shared_manager.READY_SUFFIX):
+                        continue
+                    resolved = Path(os.path.realpath(checkout))
+                    if resolved == current or resolved in referenced:
+                        continue
+                    ready = checkout.with_name(checkout.name + shared_manager.READY_SUFFIX)
+                    # Unmark first: an interrupted removal is then recreated, never reused
+                    if ready.exists():
+                        ready.unlink()
+                    self.workspace_manager.worktree_manager.remove_worktree(checkout)
+                    force_rmtree(checkout)
+                    messages.append((True, f"{repo_dir.name}: removed unused {checkout.name}"))
+        return messages
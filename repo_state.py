@@ -0,0 +1,254 @@
+"""
+Repository State - Reads git repository metadata directly from disk, without spawning git
+"""
+
+import mmap
+import re
+from collections import namedtuple
+from pathlib import Path
+
+
+RepoState = namedtuple("RepoState", [
+    "path",          # working tree path
+    "git_dir",       # per-worktree git directory
+    "common_dir",    # shared git directory (== git_dir unless a linked worktree)
+    "is_worktree",   # linked worktree created with git worktree add
+    "branch",        # checked out branch name, None when detached or unreadable
+    "head_sha",      # commit HEAD resolves to, None if unresolved
+    "upstream",      # branch.<branch>.merge without refs/heads/, or None
+    "remote_url",    # remote.origin.url, or None
+    "shallow",       # history truncated by --depth
+    "complete",      # HEAD resolves to a commit present in the object store
+    "error",         # reason the repository is unusable, or None
+])
+
+_SHA_RE = re.compile(r"^[0-9a-f]{40}$")
+_SECTION_RE = re.compile(r'^\[\s*([A-Za-z0-9.-]+)(?:\s+"((?:[^"\\]|\\.)*)")?\s*\]')
+
+
+def _read_text(path):
+    """Read a small text file, returning None if it cannot be read"""
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def find_git_dir(repo_path):
+    """Locate the git directory of a working tree (.git dir or gitdir: file)"""
+    dot_git = Path(repo_path) / ".git"
+    if dot_git.is_dir():
+        return dot_git
+    content = _read_text(dot_git) if dot_git.is_file() else None
+    if content and content.startswith("gitdir:"):
+        git_dir = Path(content[len("gitdir:"):].strip())
+        if not git_dir.is_absolute():
+            git_dir = Path(repo_path) / git_dir
+        return git_dir
+    return None
+
+
+def find_common_dir(git_dir):
+    """Shared git directory of a linked worktree, or git_dir itself"""
+    content = _read_text(Path(git_dir) / "commondir")
+    if not content:
+        return Path(git_dir)
+    common = Path(content.strip())
+    if not common.is_absolute():
+        common = Path(git_dir) / common
+    return common
+
+
+def parse_git_config(path):
+    """Parse a git config file into {"section.subsection.key": value}"""
+    values = {}
+    content = _read_text(path)
+    if content is None:
+        return values
+
+    section = ""
+    for raw_line in content.splitlines():
+        line = raw_line.strip()
+        if not line or line[0] in "#;":
+            continue
+        match = _SECTION_RE.match(line)
+        if match:
+            name, subsection = match.group(1).lower(), match.group(2)
+            if subsection is not None:
+                section = f"{name}.{subsection}"
+            elif "." in name:
+                # Deprecated [section.subsection] syntax
+                head, _, tail = name.partition(".")
+                section = f"{head}.{tail}"
+            else:
+                section = name
+            line = line[match.end():].strip()
+            if not line:
+                continue
+
+        key, sep, value = line.partition("=")
+        key = key.strip().lower()
+        value = value.strip() if sep else "true"
+        # Strip trailing comments outside of quotes and surrounding quotes
+        if not value.startswith('"'):
+            value = re.split(r"\s[#;]", value, maxsplit=1)[0].strip()
+        elif value.endswith('"') and len(value) > 1:
+            value = value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+        values[f"{section}.{key}"] = value
+    return values
+
+
+def _read_packed_refs(common_dir):
+    """Parse packed-refs into {refname: sha}"""
+    refs = {}
+    content = _read_text(Path(common_dir) / "packed-refs")
+    if not content:
+        return refs
+    for line in content.splitlines():
+        if not line or line[0] in "#^":
+            continue
+        sha, _, name = line.partition(" ")
+        if _SHA_RE.match(sha) and name:
+            refs[name.strip()] = sha
+    return refs
+
+
+def resolve_ref(git_dir, common_dir, ref, packed=None, depth=0):
+    """Resolve a ref (following symbolic refs) to a sha, or None"""
+    if depth > 5:
+        return None
+    for base in (git_dir, common_dir):
+        content = _read_text(Path(base) / ref)
+        if content is None:
+            continue
+        content = content.strip()
+        if content.startswith("ref:"):
+            return resolve_ref(git_dir, common_dir, content[4:].strip(), packed, depth + 1)
+        if _SHA_RE.match(content):
+            return content
+    if packed is None:
+        packed = _read_packed_refs(common_dir)
+    return packed.get(ref)
+
+
+def _object_dirs(common_dir):
+    """Object directory of a repository followed by its alternates"""
+    objects = Path(common_dir) / "objects"
+    dirs = [objects]
+    content = _read_text(objects / "info" / "alternates")
+    for line in (content or "").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            alternate = Path(line)
+            dirs.append(alternate if alternate.is_absolute() else objects / alternate)
+    return dirs
+
+
+def _idx_contains(idx_path, sha_bytes):
+    """Binary search a pack .idx (v1 or v2) for an object id"""
+    try:
+        with open(idx_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data[:4] == b"\xfftOc":
+                    fanout_at, entry_size, sha_offset = 8, 20, 0
+                    names_at = 8 + 256 * 4
+                else:
+                    fanout_at, entry_size, sha_offset = 0, 24, 4
+                    names_at = 256 * 4
+
+                first = sha_bytes[0]
+                def fanout(i):
+                    at = fanout_at + i * 4
+                    return int.from_bytes(data[at:at + 4], "big")
+                low = fanout(first - 1) if first else 0
+                high = fanout(first)
+
+                while low < high:
+                    mid = (low + high) // 2
+                    at = names_at + mid * entry_size + sha_offset
+                    candidate = data[at:at + 20]
+                    if candidate == sha_bytes:
+                        return True
+                    if candidate < sha_bytes:
+                        low = mid + 1
+                    else:
+                        high = mid
+    except (OSError, ValueError):
+        return False
+    return False
+
+
+def has_object(common_dir, sha):
+    """Check whether an object exists loose or in any pack, including alternates"""
+    sha_bytes = bytes.fromhex(sha)
+    for objects in _object_dirs(common_dir):
+        if (objects / sha[:2] / sha[2:]).exists():
+            return True
+        pack_dir = objects / "pack"
+        if pack_dir.is_dir():
+            for idx_path in pack_dir.glob("*.idx"):
+                if _idx_contains(idx_path, sha_bytes):
+                    return True
+    return False
+
+
+def read_repo_state(repo_path):
+    """Inspect a working tree and return its RepoState"""
+    repo_path = Path(repo_path)
+    git_dir = find_git_dir(repo_path)
+    if git_dir is None or not (git_dir / "HEAD").exists():
+        reason = "not a git repository" if repo_path.exists() else "directory missing"
+        return RepoState(repo_path, git_dir, None, False, None, None, None, None,
+                         False, False, reason)
+
+    common_dir = find_common_dir(git_dir)
+    is_worktree = common_dir.resolve() != git_dir.resolve()
+    config = parse_git_config(common_dir / "config")
+
+    head = (_read_text(git_dir / "HEAD") or "").strip()
+    branch = None
+    packed = _read_packed_refs(common_dir)
+    if head.startswith("ref:"):
+        head_ref = head[4:].strip()
+        if head_ref.startswith("refs/heads/"):
+            branch = head_ref[len("refs/heads/"):]
+        head_sha = resolve_ref(git_dir, common_dir, head_ref, packed)
+    else:
+        head_sha = head if _SHA_RE.match(head) else None
+
+    upstream = None
+    if branch:
+        merge = config.get(f"branch.{branch}.merge")
+        if merge:
+            upstream = merge[len("refs/heads/"):] if merge.startswith("refs/heads/") else merge
+
+    error = None
+    if head_sha is None:
+        error = "HEAD does not point to a commit"
+    elif not has_object(common_dir, head_sha):
+        error = f"HEAD commit {head_sha[:8]} is missing from the object store"
+    elif not (git_dir / "index").exists():
+        error = "working tree was never checked out"
+
+    return RepoState(
+        path=repo_path,
+        git_dir=git_dir,
+        common_dir=common_dir,
+        is_worktree=is_worktree,
+        branch=branch,
+        head_sha=head_sha,
+        upstream=upstream,
+        remote_url=config.get("remote.origin.url"),
+        shallow=(common_dir / "shallow").exists(),
+        complete=error is None,
+        error=error,
+    )
+
+
+def normalize_url(url):
+    """Normalize a remote URL for comparison"""
+    url = (url or "").strip().rstrip("/")
+    if url.endswith(".git"):
+        url = url[:-4]
+    return url
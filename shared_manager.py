@@ -0,0 +1,177 @@
+"""
+Shared Manager - Read-only checkouts pinned to a commit and shared by all workspaces
+"""
+
+import logging
+import os
+import stat
+import subprocess
+import threading
+from pathlib import Path
+
+from file_lock import FileLock
+from git_utils import force_rmtree, run_git, last_error_line, repo_slug
+
+
+def is_link(path):
+    """Check if path is a symlink or (on Windows) a directory junction"""
+    try:
+        os.readlink(path)
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def replace_link(target, link_path):
+    """Point link_path at target, replacing an existing link atomically where possible"""
+    link_path = Path(link_path)
+    tmp_link = link_path.with_name(
+        f".{link_path.name}.link-{os.getpid()}-{threading.get_ident()}"
+    )
+    try:
+        os.symlink(target, tmp_link, target_is_directory=True)
+    except OSError:
+        if os.name != "nt":
+            raise
+        # Symlinks need developer mode or admin rights on Windows; junctions do not
+        subprocess.run(["cmd", "/c", "mklink", "/J", str(tmp_link), str(target)],
+                       check=True, capture_output=True)
+    try:
+        os.replace(tmp_link, link_path)
+    except OSError:
+        # Windows cannot rename over an existing directory link
+        if is_link(link_path):
+            remove_link(link_path)
+        os.replace(tmp_link, link_path)
+
+
+def remove_link(link_path):
+    """Remove a symlink or junction without touching its target"""
+    if os.name == "nt" and Path(link_path).is_dir():
+        os.rmdir(link_path)
+    else:
+        os.unlink(link_path)
+
+
+class SharedManager:
+    """Manages read-only shared checkouts, one per repository URL and commit"""
+
+    CURRENT_LINK = "current"
+    READY_SUFFIX = ".ready"
+
+    def __init__(self, config, worktree_manager):
+        """Initialize shared checkout manager with configuration"""
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.worktree_manager = worktree_manager
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    @property
+    def store_root(self):
+        """Directory holding every shared checkout"""
+        return Path(self.config.workspace_base_path) / self.config.shared_store_dir
+
+    def repo_dir(self, url):
+        """Directory holding the checkouts of one repository URL"""
+        return self.store_root / repo_slug(url)
+
+    def checkout_path(self, url, sha):
+        """Location of the checkout of url at commit sha"""
+        return self.repo_dir(url) / f"checkout-{sha[:12]}"
+
+    def current_checkout(self, url):
+        """Checkout the current link points to, or None"""
+        link = self.repo_dir(url) / self.CURRENT_LINK
+        return Path(os.path.realpath(link)) if is_link(link) else None
+
+    def linked_checkout(self, repo_path):
+        """Shared checkout a workspace link points to, or None if not a shared link"""
+        if not is_link(repo_path):
+            return None
+        target = Path(os.path.realpath(repo_path))
+        store = Path(os.path.realpath(self.store_root))
+        return target if store in target.parents else None
+
+    def _lock_for(self, url):
+        """Serialize updates of the same repository between worker threads"""
+        with self._locks_guard:
+            return self._locks.setdefault(url, threading.Lock())
+
+    def resolve(self, central, ref):
+        """Commit a branch, tag or commit id resolves to in a central clone"""
+        candidates = [f"refs/remotes/origin/{ref}", f"refs/tags/{ref}", ref] if ref else [
+            "refs/remotes/origin/HEAD"
+        ]
+        for candidate in candidates:
+            result = run_git(["--git-dir", str(central), "rev-parse", "--verify", "--quiet",
+                              f"{candidate}^{{commit}}"])
+            if result.returncode == 0:
+                return result.stdout.strip()
+        return None
+
+    def checkout(self, url, ref, env=None, setup=None):
+        """Return the shared checkout of url at ref, creating and publishing it if needed"""
+        repo_dir = self.repo_dir(url)
+        with self._lock_for(url), FileLock(repo_dir / ".lock"):
+            success, result = self.worktree_manager.update_central(url)
+            if not success:
+                return False, result
+            central = result
+
+            sha = self.resolve(central, ref)
+            if sha is None:
+                return False, f"'{ref or 'HEAD'}' not found in {url}"
+
+            path = self.checkout_path(url, sha)
+            ready = path.with_name(path.name + self.READY_SUFFIX)
+            if not ready.exists():
+                success, message = self._create_checkout(central, path, sha, env, setup)
+                if not success:
+                    return False, message
+                ready.touch()
+
+            # Workspaces link to a specific checkout; "current" only tells
+            # new workspaces which one to use, so switching it never changes
+            # the files an existing workspace sees.
+            replace_link(path, repo_dir / self.CURRENT_LINK)
+            return True, path
+
+    def _create_checkout(self, central, path, sha, env, setup):
+        """Check out sha as a detached worktree and make its files read-only"""
+        if path.exists():
+            # Left over from an interrupted run: never marked ready
+            self.worktree_manager.remove_worktree(path)
+            force_rmtree(path)
+
+        self.logger.info(f"Creating shared checkout {path}")
+        result = run_git(["--git-dir", str(central), "worktree", "add", "--quiet", "--detach",
+                          str(path), sha], env=env)
+        if result.returncode != 0:
+            return False, f"Shared checkout failed: {last_error_line(result.stderr)}"
+
+        if setup is not None:
+            success, message = setup(path)
+            if not success:
+                self.worktree_manager.remove_worktree(path)
+                return False, message
+
+        self._make_read_only(path)
+        return True, path
+
+    @staticmethod
+    def _make_read_only(path):
+        """Remove write permission from every file of a checkout"""
+        write_bits = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+        for root, dirs, files in os.walk(path):
+            for name in files:
+                file_path = os.path.join(root, name)
+                if os.path.islink(file_path):
+                    continue
+                mode = os.stat(file_path).st_mode
+                os.chmod(file_path, mode & ~write_bits)
+
+    def link(self, checkout, repo_path):
+        """Point a workspace's repository path at a shared checkout"""
+        replace_link(checkout, repo_path)
+        return repo_path
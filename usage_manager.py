@@ -0,0 +1,190 @@
+"""
+Usage Manager - Disk usage of workspaces and shared stores, walked in parallel and cached
+"""
+
+import json
+import logging
+import os
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+# Parts of a workspace the report breaks repositories down into
+CATEGORIES = (".git", "build", ".metadata", "other")
+
+
+def format_size(size):
+    """Human readable byte count"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def category_of(relative_parts):
+    """Category of a directory inside a workspace, from its path parts"""
+    for category in CATEGORIES[:-1]:
+        if category in relative_parts:
+            return category
+    return "other"
+
+
+class UsageManager:
+    """Measures directory trees like du, counting hardlinked files once"""
+
+    CACHE_FILE = ".usage-cache.json"
+
+    def __init__(self, config):
+        """Initialize usage manager with configuration"""
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def cache_path(self):
+        """Per-directory results of the previous walk"""
+        return Path(self.config.workspace_base_path) / self.CACHE_FILE
+
+    def _load_cache(self):
+        """Cached directory entries by path, or an empty cache"""
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("dirs", {})
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _save_cache(self, dirs):
+        """Atomically replace the cache"""
+        tmp_path = self.cache_path.with_name(
+            f"{self.CACHE_FILE}.tmp-{os.getpid()}-{threading.get_ident()}"
+        )
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"dirs": dirs}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            self.logger.warning(f"Could not write usage cache: {str(e)}")
+
+    @staticmethod
+    def _allocated(info):
+        """Bytes a file occupies on disk (apparent size where blocks are unknown)"""
+        blocks = getattr(info, "st_blocks", None)
+        return blocks * 512 if blocks is not None else info.st_size
+
+    def _scan_dir(self, path, cached):
+        """Sizes of the files directly in path, reusing cached if path is unchanged
+
+        A directory's mtime changes when entries are added, removed or renamed,
+        which is how git, Gradle and the automation write files.
+        """
+        try:
+            info = os.stat(path, follow_symlinks=False)
+        except OSError:
+            return None
+        if cached is not None and cached.get("mtime") == info.st_mtime_ns:
+            return cached
+
+        entry = {"mtime": info.st_mtime_ns, "bytes": self._allocated(info),
+                 "linked": [], "dirs": []}
+        # Git objects and Gradle cache jars are what clones and golden copies
+        # hardlink. Their link count can change while the directory (and so
+        # its cache entry) does not, so they are always tracked by inode.
+        # DirEntry.stat() has no inode or link count on Windows.
+        parts = Path(path).parts
+        track_inodes = "objects" in parts or ".gradle" in parts
+        full_stat = os.name == "nt" and track_inodes
+        try:
+            with os.scandir(path) as entries:
+                for child in entries:
+                    try:
+                        child_info = child.stat(follow_symlinks=False)
+                        if full_stat and not stat.S_ISDIR(child_info.st_mode):
+                            child_info = os.lstat(child.path)
+                    except OSError:
+                        continue
+                    if stat.S_ISDIR(child_info.st_mode):
+                        entry["dirs"].append(child.name)
+                    elif track_inodes or child_info.st_nlink > 1:
+                        entry["linked"].append(
+                            [child_info.st_dev, child_info.st_ino, self._allocated(child_info)]
+                        )
+                    else:
+                        entry["bytes"] += self._allocated(child_info)
+        except OSError:
+            pass
+        return entry
+
+    def walk(self, roots, cache):
+        """Scan every directory below roots level by level in parallel
+
+        Returns {root: {path: entry}} for every directory found.
+        """
+        scanned = {root: {} for root in roots}
+        frontier = [(root, root) for root in roots]
+        with ThreadPoolExecutor(max_workers=self.config.usage_workers) as executor:
+            while frontier:
+                entries = executor.map(
+                    lambda item: self._scan_dir(item[1], cache.get(item[1])), frontier
+                )
+                next_frontier = []
+                for (root, path), entry in zip(frontier, entries):
+                    if entry is None:
+                        continue
+                    scanned[root][path] = entry
+                    next_frontier.extend(
+                        (root, os.path.join(path, name)) for name in entry["dirs"]
+                    )
+                frontier = next_frontier
+        return scanned
+
+    @staticmethod
+    def _below(path, roots):
+        """Check if path is one of roots or inside one of them"""
+        while True:
+            if path in roots:
+                return True
+            parent = os.path.dirname(path)
+            if parent == path:
+                return False
+            path = parent
+
+    def measure(self, roots, use_cache=True):
+        """Usage of each root broken down by top-level item and category
+
+        Returns {root: {"total": bytes, "items": {name: {category: bytes}}}}
+        keyed by absolute root path. A file hardlinked into several roots is
+        counted for the first root (in the order given) that contains it.
+        """
+        roots = list(dict.fromkeys(os.path.abspath(root) for root in roots))
+        cache = self._load_cache()
+        scanned = self.walk(roots, cache if use_cache else {})
+        # Entries outside these roots stay cached for other reports;
+        # directories that vanished below them are dropped.
+        root_set = set(roots)
+        cache = {path: entry for path, entry in cache.items()
+                 if not self._below(path, root_set)}
+        for entries in scanned.values():
+            cache.update(entries)
+        self._save_cache(cache)
+
+        seen = set()
+        report = {}
+        for root in roots:
+            usage = {"total": 0, "items": {}}
+            for path, entry in scanned[root].items():
+                size = entry["bytes"]
+                for dev, ino, allocated in entry["linked"]:
+                    if (dev, ino) not in seen:
+                        seen.add((dev, ino))
+                        size += allocated
+
+                parts = Path(os.path.relpath(path, root)).parts if path != root else ()
+                # Files directly in the root are grouped together
+                name = parts[0] if parts else "."
+                item = usage["items"].setdefault(name, dict.fromkeys(CATEGORIES, 0))
+                item[category_of(parts[1:])] += size
+                usage["total"] += size
+            report[root] = usage
+        return report
@@ -0,0 +1,227 @@
+"""
+Workspace Index - Per-workspace manifest (workspace.json) and a base-level index of all workspaces
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from file_lock import FileLock
+from repo_state import read_repo_state
+
+
+def _now():
+    """Current local time as an ISO timestamp"""
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class WorkspaceIndex:
+    """Records what each workspace contains and how it was built"""
+
+    MANIFEST_FILE = "workspace.json"
+    INDEX_FILE = ".workspace-index.json"
+    LOCK_FILE = ".workspace-index.lock"
+    MAX_DEPLOYMENTS = 10
+
+    def __init__(self, config):
+        """Initialize workspace index with configuration"""
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self._thread_lock = threading.Lock()
+
+    @property
+    def base_path(self):
+        """Directory containing all workspaces"""
+        return Path(self.config.workspace_base_path)
+
+    @property
+    def index_path(self):
+        """Location of the base-level index"""
+        return self.base_path / self.INDEX_FILE
+
+    def manifest_path(self, workspace_path):
+        """Location of a workspace's manifest"""
+        return Path(workspace_path) / self.MANIFEST_FILE
+
+    def _lock(self):
+        """Lock serializing index updates across processes"""
+        return FileLock(self.base_path / self.LOCK_FILE)
+
+    @staticmethod
+    def _read_json(path, default):
+        """Read a JSON file, returning default if missing or corrupt"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    @staticmethod
+    def _write_json(path, data):
+        """Atomically replace a JSON file"""
+        path = Path(path)
+        tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def version_of(self, name):
+        """Version number encoded in a workspace name, or None"""
+        prefix = self.config.workspace_prefix
+        suffix = name[len(prefix):] if name.startswith(prefix) else ""
+        return int(suffix) if suffix.isdigit() else None
+
+    def load_index(self):
+        """Return the base index, building it from disk the first time"""
+        index = self._read_json(self.index_path, None)
+        if index is None:
+            index = self.rebuild()
+        return index
+
+    def rebuild(self):
+        """Scan WORKSPACE_BASE_PATH once and write a fresh index"""
+        index = {"workspaces": {}}
+        if self.base_path.exists():
+            for item in self.base_path.iterdir():
+                version = self.version_of(item.name)
+                if version is None or not item.is_dir():
+                    continue
+                manifest = self._read_json(self.manifest_path(item), {})
+                index["workspaces"][item.name] = self._index_entry(item, version, manifest)
+
+            with self._thread_lock, self._lock():
+                self._write_json(self.index_path, index)
+        return index
+
+    @staticmethod
+    def _index_entry(workspace_path, version, manifest):
+        """Summary of a manifest kept in the base index"""
+        return {
+            "path": str(workspace_path),
+            "version": version,
+            "created": manifest.get("created"),
+            "updated": manifest.get("updated"),
+            "repos": {
+                name: info.get("sha") for name, info in manifest.get("repos", {}).items()
+            },
+            "build_fingerprint": manifest.get("build", {}).get("fingerprint"),
+        }
+
+    def list_workspaces(self):
+        """Workspace paths from the index, ordered by version"""
+        entries = self.load_index().get("workspaces", {}).values()
+        return [Path(entry["path"]) for entry in sorted(entries, key=lambda e: e["version"])]
+
+    def latest_version(self):
+        """Highest workspace version ever allocated according to the index"""
+        index = self.load_index()
+        versions = [e["version"] for e in index.get("workspaces", {}).values()]
+        return max(versions + [index.get("last_version", 0)])
+
+    def load_manifest(self, workspace_path):
+        """Return a workspace's manifest, or an empty one"""
+        return self._read_json(self.manifest_path(workspace_path), {})
+
+    def update_manifest(self, workspace_path, update):
+        """Apply update(manifest) and atomically write manifest and index"""
+        workspace_path = Path(workspace_path)
+        version = self.version_of(workspace_path.name)
+
+        with self._thread_lock, self._lock():
+            manifest = self.load_manifest(workspace_path)
+            manifest.setdefault("name", workspace_path.name)
+            manifest.setdefault("created", _now())
+            manifest.setdefault("repos", {})
+            manifest.setdefault("steps", {})
+            manifest["path"] = str(workspace_path)
+            manifest["version"] = version
+            update(manifest)
+            manifest["updated"] = _now()
+            self._write_json(self.manifest_path(workspace_path), manifest)
+
+            if version is not None:
+                index = self._read_json(self.index_path, {"workspaces": {}})
+                index.setdefault("workspaces", {})[workspace_path.name] = (
+                    self._index_entry(workspace_path, version, manifest)
+                )
+                # Never hand out the number of a removed workspace again
+                index["last_version"] = max(index.get("last_version", 0), version)
+                self._write_json(self.index_path, index)
+        return manifest
+
+    def register_workspace(self, workspace_path):
+        """Create the manifest of a new workspace and add it to the index"""
+        return self.update_manifest(workspace_path, lambda manifest: None)
+
+    def remove_workspace(self, workspace_path):
+        """Drop a workspace from the index"""
+        name = Path(workspace_path).name
+        with self._thread_lock, self._lock():
+            index = self._read_json(self.index_path, None)
+            if index and name in index.get("workspaces", {}):
+                del index["workspaces"][name]
+                self._write_json(self.index_path, index)
+
+    def record_repos(self, workspace_path, repos):
+        """Record the current branch and commit of each repository"""
+        states = {
+            repo["name"]: read_repo_state(Path(workspace_path) / repo["name"]) for repo in repos
+        }
+
+        def update(manifest):
+            for repo in repos:
+                state = states[repo["name"]]
+                if not state.complete:
+                    continue
+                entry = manifest["repos"].setdefault(repo["name"], {"cloned_at": _now()})
+                if entry.get("sha") != state.head_sha:
+                    entry["updated_at"] = _now()
+                entry.update({
+                    "url": repo["url"],
+                    "configured_branch": repo.get("branch", ""),
+                    "branch": state.branch,
+                    "sha": state.head_sha,
+                    "mode": repo.get("mode", "clone"),
+                })
+            manifest["steps"]["clone"] = _now()
+
+        return self.update_manifest(workspace_path, update)
+
+    def record_step(self, workspace_path, step, details=None):
+        """Record completion of an automation step"""
+        def update(manifest):
+            manifest["steps"][step] = _now()
+            if details:
+                manifest[step] = details
+
+        return self.update_manifest(workspace_path, update)
+
+    def record_build(self, workspace_path, fingerprint, success, message):
+        """Record the outcome and fingerprint of a build"""
+        def update(manifest):
+            manifest["build"] = {
+                "fingerprint": fingerprint if success else None,
+                "success": success,
+                "message": message,
+                "built_at": _now(),
+            }
+            manifest["steps"]["build"] = _now()
+
+        return self.update_manifest(workspace_path, update)
+
+    def record_deployment(self, workspace_path, artifact, target):
+        """Record an artifact deployed to Tomcat"""
+        def update(manifest):
+            deployments = manifest.setdefault("deployments", [])
+            deployments.append({
+                "artifact": str(artifact),
+                "target": str(target),
+                "deployed_at": _now(),
+            })
+            del deployments[:-self.MAX_DEPLOYMENTS]
+            manifest["steps"]["deploy"] = _now()
+
+        return self.update_manifest(workspace_path, update)
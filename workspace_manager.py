@@ -2,11 +2,29 @@
 Workspace Manager - Handles workspace creation and repository cloning
 """
 
+import contextlib
 import os
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import logging
 
+from bundle_manager import BundleManager
+from clone_progress import CloneProgress, iter_output_records, parse_progress_line
+from golden_manager import GoldenManager
+from git_utils import (
+    RETRYABLE_ERRORS, classify_git_error, force_rmtree, git_env, last_error_line, run_git,
+    url_host
+)
+from maintenance_manager import MaintenanceManager
+from mirror_manager import MirrorManager
+from repo_state import normalize_url, parse_git_config, read_repo_state
+from shared_manager import SharedManager, is_link, remove_link
+from workspace_index import WorkspaceIndex
+from worktree_manager import WorktreeManager
+
 
 class WorkspaceManager:
     """Manages workspace creation and repository operations"""
@@ -15,33 +33,117 @@ class WorkspaceManager:
         """Initialize workspace manager with configuration"""
         self.config = config
         self.logger = logging.getLogger(__name__)
+        self.mirror_manager = MirrorManager(config)
+        self.worktree_manager = WorktreeManager(config)
+        self.shared_manager = SharedManager(config, self.worktree_manager)
+        self.bundle_manager = BundleManager(config, self.mirror_manager)
+        self.maintenance_manager = MaintenanceManager(config)
+        self.index = WorkspaceIndex(config)
+        self.golden_manager = GoldenManager(config, self.index)
+        self.progress = CloneProgress(config.progress_refresh_interval)
+        self.lfs_seconds = {}
+        self._host_slots = {}
+        self._host_slots_lock = threading.Lock()
+
+    def _emit(self, repo_name, message):
+        """Print a line of output prefixed with the repository name"""
+        self.progress.write_line(f"  [{repo_name}] {message}")
+
+    def _clone_mode_args(self, repo):
+        """Shallow, partial and single-branch options configured for a repo"""
+        args = []
+        if repo.get("depth"):
+            args.append(f"--depth={repo['depth']}")
+        if repo.get("filter"):
+            args.append(f"--filter={repo['filter']}")
+        if repo.get("single_branch"):
+            args.append("--single-branch")
+        if repo.get("sparse"):
+            # Only top-level files are checked out until the cone is set
+            args.append("--sparse")
+        return args
+
+    def _host_slot(self, url):
+        """Semaphore limiting concurrent operations against the host of url"""
+        limit = self.config.clone_host_concurrency
+        if not limit:
+            return contextlib.nullcontext()
+        host = url_host(url)
+        with self._host_slots_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(limit)
+            return self._host_slots[host]
+
+    @staticmethod
+    def _interleave_by_host(repos):
+        """Order repos round-robin across hosts so workers rarely wait on one host"""
+        by_host = {}
+        for repo in repos:
+            by_host.setdefault(url_host(repo["url"]), []).append(repo)
+        queues = list(by_host.values())
+        ordered = []
+        while queues:
+            ordered.extend(queue.pop(0) for queue in queues)
+            queues = [queue for queue in queues if queue]
+        return ordered
+
+    def _checkout_env(self, repo):
+        """Environment for commands that check out files of a repository"""
+        # LFS files are left as pointers during checkout and downloaded
+        # afterwards in one parallel batch by pull_lfs_objects.
+        return git_env({"GIT_LFS_SKIP_SMUDGE": "1"}) if repo.get("lfs") else None
+
+    def _reference_args(self, repo):
+        """Update the shared mirror and return clone args that borrow from it"""
+        if not self.config.use_mirror_cache:
+            return []
+
+        repo_url = repo["url"]
+        self._emit(repo["name"], "Updating mirror cache...")
+        success, result = self.mirror_manager.update_mirror(repo_url)
+        if success:
+            mirror = result
+        else:
+            # A stale mirror still saves most of the transfer
+            mirror = self.mirror_manager.get_mirror(repo_url)
+            self._emit(repo["name"], f"[WARNING] {result}")
+            if mirror is None:
+                return []
+
+        args = ["--reference-if-able", str(mirror)]
+        if self.config.mirror_dissociate:
+            args.append("--dissociate")
+        return args
 
     def get_existing_workspaces(self):
-        """Get list of existing workspaces"""
+        """Get list of existing workspaces from the workspace index"""
+        return self.index.list_workspaces()
+
+    def get_next_workspace_path(self):
+        """Predict the next workspace path (allocate_workspace claims it)"""
         base_path = Path(self.config.workspace_base_path)
         prefix = self.config.workspace_prefix
-        
-        if not base_path.exists():
-            return []
-        
-        workspaces = []
-        for item in base_path.iterdir():
-            if item.is_dir() and item.name.startswith(prefix):
-                workspaces.append(item)
-        
-        return sorted(workspaces, key=lambda x: x.name)
+        return base_path / f"{prefix}{self.index.latest_version() + 1}"
 
-    def get_next_workspace_path(self):
-        """Determine the next workspace version number"""
+    def allocate_workspace(self):
+        """Atomically claim the next free workspace version"""
         base_path = Path(self.config.workspace_base_path)
         prefix = self.config.workspace_prefix
+        base_path.mkdir(parents=True, exist_ok=True)
 
-        version = 1
+        # Creating the directory is the claim: mkdir fails for every run but
+        # one, so concurrent runs can never pick the same version. Starting
+        # from the index's counter makes this a single attempt in practice.
+        version = self.index.latest_version() + 1
         while True:
             workspace_path = base_path / f"{prefix}{version}"
-            if not workspace_path.exists():
-                return workspace_path
-            version += 1
+            try:
+                workspace_path.mkdir()
+            except FileExistsError:
+                version += 1
+                continue
+            self.index.register_workspace(workspace_path)
+            return workspace_path
 
     def select_or_create_workspace(self):
         """Interactive workspace selection or creation"""
@@ -68,6 +170,10 @@ class WorkspaceManager:
                     choice_num = int(choice)
                     if 1 <= choice_num <= len(existing):
                         selected = existing[choice_num - 1]
+                        if not selected.is_dir():
+                            print(f"[ERROR] {selected} no longer exists, removing it from the index")
+                            self.index.remove_workspace(selected)
+                            return self.select_or_create_workspace()
                         print(f"[INFO] Using existing workspace: {selected}")
                         return selected, False
                     elif choice_num == len(existing) + 1:
@@ -85,103 +191,882 @@ class WorkspaceManager:
             return self.get_next_workspace_path(), True
 
     def validate_workspace_repos(self, workspace_path):
-        """Check which repositories are missing in the workspace"""
+        """Check which repositories are missing or no longer match the configuration
+
+        A repository directory that exists but cannot be used (no commit,
+        never checked out) is reported as mismatched with "unusable" set, not
+        as missing: it may hold local work and must never be cloned over.
+        """
         workspace_path = Path(workspace_path)
         missing_repos = []
         existing_repos = []
-        
+        mismatched_repos = []
+
         for repo in self.config.repositories:
             repo_path = workspace_path / repo["name"]
-            if repo_path.exists() and repo_path.is_dir():
-                existing_repos.append(repo)
-            else:
-                missing_repos.append(repo)
-        
-        return existing_repos, missing_repos
+            state = read_repo_state(repo_path)
+            if not state.complete:
+                # A worktree whose central clone vanished is set aside and
+                # recreated by add_worktree_repository, so it counts as missing.
+                if repo.get("mode") == "worktree" and self.worktree_manager.is_dangling(repo_path):
+                    missing_repos.append(repo)
+                elif repo_path.is_dir() and any(repo_path.iterdir()):
+                    mismatched_repos.append(
+                        {"repo": repo, "reasons": [f"unusable: {state.error}"], "unusable": True}
+                    )
+                else:
+                    missing_repos.append(repo)
+                continue
+
+            existing_repos.append(repo)
+            reasons = self._config_mismatches(repo, state)
+            if reasons:
+                mismatched_repos.append({"repo": repo, "reasons": reasons, "unusable": False})
+
+        return existing_repos, missing_repos, mismatched_repos
+
+    def _config_mismatches(self, repo, state):
+        """Differences between a cloned repository and its configuration"""
+        reasons = []
+        if normalize_url(state.remote_url) != normalize_url(repo["url"]):
+            reasons.append(f"origin is {state.remote_url or 'not set'}, expected {repo['url']}")
+
+        shared = self.shared_manager.linked_checkout(state.path) is not None
+        if repo.get("mode") == "shared" or shared:
+            if not shared:
+                reasons.append("is a regular checkout, expected a shared checkout link")
+            elif repo.get("mode") != "shared":
+                reasons.append(f"is a shared checkout link, expected mode {repo.get('mode')}")
+            return reasons
+
+        wanted = repo.get("branch")
+        if wanted:
+            # Worktrees sit on <workspace>/<branch> tracking the configured branch
+            current = state.upstream or state.branch
+            if state.branch is None:
+                reasons.append(f"HEAD is detached, expected branch {wanted}")
+            elif current != wanted:
+                reasons.append(f"on branch {current}, expected {wanted}")
+        return reasons
 
     def create_workspace(self, workspace_path=None):
-        """Create a new workspace directory"""
-        if workspace_path is None:
-            workspace_path = self.get_next_workspace_path()
+        """Create a new workspace directory, returning the path actually claimed"""
+        if workspace_path is not None:
+            try:
+                Path(workspace_path).parent.mkdir(parents=True, exist_ok=True)
+                Path(workspace_path).mkdir()
+                self.index.register_workspace(workspace_path)
+                print(f"Creating workspace: {workspace_path}")
+                return Path(workspace_path)
+            except FileExistsError:
+                print(f"[INFO] {Path(workspace_path).name} was claimed by another run")
 
+        workspace_path = self.allocate_workspace()
         print(f"Creating workspace: {workspace_path}")
-        workspace_path.mkdir(parents=True, exist_ok=True)
-
         return workspace_path
 
+    def remove_workspace(self, workspace_path):
+        """Delete a workspace, deregistering any worktrees it contains"""
+        workspace_path = Path(workspace_path)
+        self.index.remove_workspace(workspace_path)
+        if not workspace_path.exists():
+            return True, workspace_path
+
+        for item in workspace_path.iterdir():
+            if is_link(item):
+                # Shared checkouts outlive the workspaces linking to them
+                remove_link(item)
+            elif self.worktree_manager.is_worktree(item):
+                self.worktree_manager.remove_worktree(item)
+
+        try:
+            force_rmtree(workspace_path, ignore_errors=False)
+        except OSError as e:
+            return False, f"Failed to remove workspace: {str(e)}"
+        return True, workspace_path
+
+    def _set_aside_dangling_worktree(self, repo_name, repo_path):
+        """Move a worktree whose central clone vanished out of the way"""
+        orphan = repo_path.with_name(f"{repo_path.name}.orphaned-{int(time.time())}")
+        self._emit(
+            repo_name,
+            f"[WARNING] Worktree is no longer registered, moving it to {orphan.name}"
+        )
+        os.replace(repo_path, orphan)
+
+    def add_worktree_repository(self, repo, workspace_path):
+        """Check out a repository as a worktree of its central clone"""
+        repo_url = repo["url"]
+        repo_name = repo["name"]
+        repo_path = workspace_path / repo_name
+
+        self._emit(repo_name, f"Adding worktree from {repo_url}")
+        try:
+            if repo_path.exists() and self.worktree_manager.is_dangling(repo_path):
+                self._set_aside_dangling_worktree(repo_name, repo_path)
+
+            self._emit(repo_name, "Updating central clone...")
+            success, result = self.worktree_manager.update_central(repo_url)
+            if not success:
+                self._emit(repo_name, f"[ERROR] {result}")
+                return False, result
+            central = result
+
+            default_branch = self.worktree_manager.default_branch(central)
+            branch = repo.get("branch") or default_branch
+            if branch and not self.worktree_manager.has_remote_branch(central, branch):
+                self._emit(
+                    repo_name,
+                    f"[WARNING] Branch '{branch}' not found on remote, "
+                    f"using the default branch instead"
+                )
+                branch = default_branch
+            if not branch:
+                error_msg = "Could not determine the remote default branch"
+                self._emit(repo_name, f"[ERROR] {error_msg}")
+                return False, error_msg
+
+            # A branch can be checked out in only one worktree at a time,
+            # so each workspace gets its own tracking branch.
+            local_branch = f"{workspace_path.name}/{branch}"
+            self._emit(repo_name, f"Branch : {local_branch} (tracking origin/{branch})")
+            success, result = self.worktree_manager.add_worktree(
+                repo_url, central, repo_path, branch, local_branch,
+                no_checkout=bool(repo.get("sparse") or repo.get("lfs"))
+            )
+            if not success:
+                self._emit(repo_name, f"[ERROR] {result}")
+                return False, result
+
+            if repo.get("sparse"):
+                success, message = self.apply_sparse_checkout(repo, repo_path)
+                if not success:
+                    self._emit(repo_name, f"[WARNING] {message}")
+            if repo.get("sparse") or repo.get("lfs"):
+                run_git(["checkout"], cwd=repo_path, env=self._checkout_env(repo))
+
+            if repo.get("lfs"):
+                success, _, result = self.pull_lfs_objects(repo, repo_path)
+                if not success:
+                    self._emit(repo_name, f"[ERROR] {result}")
+                    return False, result
+
+            if repo.get("submodules"):
+                success, _, result = self.update_submodules(repo, repo_path)
+                if not success:
+                    self._emit(repo_name, f"[ERROR] {result}")
+                    return False, result
+
+            self._configure_clone(repo_name, repo_path)
+            return True, repo_path
+
+        except Exception as e:
+            error_msg = f"Worktree creation failed: {str(e)}"
+            self._emit(repo_name, f"[ERROR] {error_msg}")
+            return False, error_msg
+
+    def add_shared_repository(self, repo, workspace_path):
+        """Link a repository to the shared read-only checkout of its configured ref"""
+        repo_url = repo["url"]
+        repo_name = repo["name"]
+        repo_path = workspace_path / repo_name
+
+        if repo_path.exists() and self.shared_manager.linked_checkout(repo_path) is None:
+            error_msg = f"{repo_path} exists and is not a shared checkout link"
+            self._emit(repo_name, f"[ERROR] {error_msg}")
+            return False, error_msg
+
+        def setup(checkout):
+            if repo.get("lfs"):
+                success, _, message = self.pull_lfs_objects(repo, checkout)
+                if not success:
+                    return False, message
+            if repo.get("submodules"):
+                success, _, message = self.update_submodules(repo, checkout)
+                if not success:
+                    return False, message
+            return True, checkout
+
+        self._emit(repo_name, f"Linking shared checkout of {repo_url}")
+        try:
+            success, result = self.shared_manager.checkout(
+                repo_url, repo.get("branch"), env=self._checkout_env(repo), setup=setup
+            )
+            if not success:
+                self._emit(repo_name, f"[ERROR] {result}")
+                return False, result
+
+            self.shared_manager.link(result, repo_path)
+            self._emit(repo_name, f"Shared checkout: {result.name} (read-only)")
+            return True, repo_path
+
+        except Exception as e:
+            error_msg = f"Shared checkout failed: {str(e)}"
+            self._emit(repo_name, f"[ERROR] {error_msg}")
+            return False, error_msg
+
+    def _configure_clone(self, repo_name, repo_path):
+        """Apply the post-clone git settings when POST_CLONE_MAINTENANCE is on"""
+        if not self.config.post_clone_maintenance:
+            return
+        success, message = self.maintenance_manager.configure(repo_path)
+        if not success:
+            self._emit(repo_name, f"[WARNING] {message}")
+
+    def _run_git_streamed(self, repo_name, cmd, env=None):
+        """Run a git command, feeding progress to the display and printing other output"""
+        process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=env or git_env(),
+        )
+
+        # git redraws progress with carriage returns; those updates become
+        # structured events instead of thousands of printed lines.
+        output = []
+        for line in iter_output_records(process.stdout):
+            event = parse_progress_line(line)
+            if event is not None:
+                self.progress.update(repo_name, event)
+                continue
+            output.append(line)
+            self._emit(repo_name, line)
+
+        process.wait()
+        return process.returncode, output
+
+    @staticmethod
+    def _is_missing_branch(output):
+        """Detect git's 'Remote branch X not found' clone failure"""
+        return any("not found in upstream" in line for line in output)
+
+    def _staging_path(self, repo_path):
+        """Hidden sibling directory a clone is written to before publishing"""
+        return repo_path.with_name(f".{repo_path.name}.partial")
+
+    def _prepare_clone_target(self, repo_name, repo_path):
+        """Remove leftovers of failed clones so a new attempt can start clean
+
+        Only the staging directory is ever deleted. Clones are published by
+        renaming a finished staging directory, so anything at repo_path was
+        put there by someone else and may hold local work.
+        """
+        staging = self._staging_path(repo_path)
+        if staging.exists():
+            self._emit(repo_name, "Removing leftovers of an interrupted clone")
+            force_rmtree(staging)
+
+        if not repo_path.exists():
+            return True, repo_path
+        if repo_path.is_dir() and not any(repo_path.iterdir()):
+            repo_path.rmdir()
+            return True, repo_path
+        if (repo_path / ".git").exists():
+            state = read_repo_state(repo_path)
+            if not state.complete:
+                return False, f"Target directory holds an unusable repository ({state.error}): {repo_path}"
+        return False, f"Target directory already exists and is not empty: {repo_path}"
+
+    def _clone_from_bundles(self, repo, staging, bundles):
+        """Clone from the local bundle cache, then fetch only the delta from origin"""
+        repo_url = repo["url"]
+        repo_name = repo["name"]
+
+        self._emit(repo_name, f"Cloning from local bundle cache ({len(bundles)} bundle(s))")
+        returncode, output = self._run_git_streamed(
+            repo_name,
+            ["git", "clone", "--progress", "--no-checkout", str(bundles[0]), str(staging)]
+        )
+        if returncode != 0:
+            kind = classify_git_error(output)
+            return False, kind, f"Bundle clone failed: {last_error_line(chr(10).join(output))}"
+
+        for bundle in bundles[1:]:
+            result = run_git(
+                ["fetch", "--quiet", str(bundle),
+                 "+refs/heads/*:refs/remotes/origin/*", "+refs/tags/*:refs/tags/*"],
+                cwd=staging
+            )
+            if result.returncode != 0:
+                return False, "unknown", (
+                    f"Applying {bundle.name} failed: {last_error_line(result.stderr)}"
+                )
+
+        run_git(["remote", "set-url", "origin", repo_url], cwd=staging)
+        returncode, output = self._run_git_streamed(
+            repo_name, ["git", "-C", str(staging), "fetch", "--progress", "--prune", "origin"]
+        )
+        if returncode != 0:
+            self._emit(
+                repo_name,
+                "[WARNING] Remote not reachable, workspace uses the bundled snapshot"
+            )
+        return self._checkout_configured_branch(repo, staging)
+
+    def _find_sibling_clone(self, repo, workspace_path):
+        """Newest clone of the same URL in another workspace that can seed a clone"""
+        wanted_url = normalize_url(repo["url"])
+        for sibling in reversed(self.index.list_workspaces()):
+            if sibling.name == workspace_path.name:
+                continue
+            state = read_repo_state(sibling / repo["name"])
+            if (not state.complete or state.is_worktree or state.shallow
+                    or normalize_url(state.remote_url) != wanted_url):
+                continue
+            # Objects missing from a partial clone would be fetched lazily
+            # from the sibling, so only full clones qualify.
+            config = parse_git_config(state.common_dir / "config")
+            if config.get("remote.origin.promisor") == "true":
+                continue
+            return state.path
+        return None
+
+    def _clone_from_sibling(self, repo, staging, sibling):
+        """Hardlink-clone a sibling workspace's repository, then fetch the delta from origin"""
+        repo_name = repo["name"]
+
+        self._emit(repo_name, f"Cloning locally from {sibling.parent.name}/{sibling.name}")
+        result = run_git(["clone", "--local", "--no-checkout", "--quiet",
+                          str(sibling), str(staging)])
+        if result.returncode != 0:
+            return False, "unknown", f"Local clone failed: {last_error_line(result.stderr)}"
+
+        # Until the fetch below replaces them, origin/* are the sibling's
+        # local branches and may hold unpushed commits; without the real
+        # remote the clone is discarded rather than published.
+        run_git(["remote", "set-url", "origin", repo["url"]], cwd=staging)
+        returncode, output = self._run_git_streamed(
+            repo_name,
+            ["git", "-C", str(staging), "fetch", "--progress", "--prune", "--prune-tags",
+             "origin"]
+        )
+        if returncode != 0:
+            kind = classify_git_error(output)
+            return False, kind, (
+                f"Fetch after local clone failed ({kind}): "
+                f"{last_error_line(chr(10).join(output))}"
+            )
+        run_git(["remote", "set-head", "origin", "--auto"], cwd=staging)
+        return self._checkout_configured_branch(repo, staging)
+
+    def _checkout_configured_branch(self, repo, staging):
+        """Check out the configured (or default) branch of a clone seeded without checkout"""
+        repo_name = repo["name"]
+        _, initial_branch = self._git_output(staging, ["symbolic-ref", "--short", "HEAD"])
+        _, default_ref = self._git_output(
+            staging, ["symbolic-ref", "--short", "refs/remotes/origin/HEAD"]
+        )
+        default_branch = default_ref.split("/", 1)[-1] if default_ref else initial_branch
+        branch = repo.get("branch") or default_branch
+        has_branch = run_git(
+            ["rev-parse", "--verify", "--quiet", f"refs/remotes/origin/{branch}"], cwd=staging
+        )
+        if has_branch.returncode != 0:
+            self._emit(
+                repo_name,
+                f"[WARNING] Branch '{branch}' not found, using the default branch instead"
+            )
+            branch = default_branch
+
+        if repo.get("sparse"):
+            success, message = self.apply_sparse_checkout(repo, staging)
+            if not success:
+                self._emit(repo_name, f"[WARNING] {message}")
+
+        result = run_git(["checkout", "--quiet", "-B", branch, "--track", f"origin/{branch}"],
+                         cwd=staging, env=self._checkout_env(repo))
+        if result.returncode != 0:
+            return False, "unknown", f"Checkout failed: {last_error_line(result.stderr)}"
+        if initial_branch and initial_branch != branch:
+            # Drop the stale local branch created from the seed's HEAD
+            run_git(["branch", "-D", initial_branch], cwd=staging)
+        return True, None, staging
+
+    def _clone_once(self, repo, staging):
+        """Run one clone attempt into staging, returning (success, error kind, message)"""
+        repo_url = repo["url"]
+        repo_name = repo["name"]
+        repo_branch = repo.get("branch", "")
+
+        if (self.config.clone_from_siblings and not self.config.use_mirror_cache
+                and not repo.get("depth") and not repo.get("filter")
+                and not repo.get("single_branch")):
+            sibling = self._find_sibling_clone(repo, staging.parent)
+            if sibling is not None:
+                success, kind, result = self._clone_from_sibling(repo, staging, sibling)
+                if success:
+                    return success, kind, result
+                self._emit(repo_name, f"[WARNING] {result} - cloning from the remote instead")
+                force_rmtree(staging)
+
+        if self.config.use_bundle_cache:
+            bundles = self.bundle_manager.get_bundles(repo_url)
+            # A bundle clone is full and self-contained, so it would ignore
+            # the shallow/partial options and the mirror reference.
+            if bundles and (self.config.use_mirror_cache or repo.get("depth")
+                            or repo.get("filter") or repo.get("single_branch")):
+                self._emit(repo_name, "[INFO] Skipping the bundle cache, it cannot honour "
+                                      "DEPTH/FILTER/SINGLE_BRANCH or the mirror cache")
+            elif bundles:
+                return self._clone_from_bundles(repo, staging, bundles)
+
+        cmd = ["git", "clone", "--progress"]
+        cmd += self._clone_mode_args(repo)
+        cmd += self._reference_args(repo)
+
+        # Check out the configured branch straight from the clone instead
+        # of writing the default branch's working tree first.
+        branch_args = ["--branch", repo_branch] if repo_branch else []
+        returncode, output = self._run_git_streamed(
+            repo_name, cmd + branch_args + [repo_url, str(staging)], self._checkout_env(repo)
+        )
+
+        if returncode != 0 and repo_branch and self._is_missing_branch(output):
+            self._emit(
+                repo_name,
+                f"[WARNING] Branch '{repo_branch}' not found on remote, "
+                f"cloning the default branch instead"
+            )
+            force_rmtree(staging)
+            returncode, output = self._run_git_streamed(
+                repo_name, cmd + [repo_url, str(staging)], self._checkout_env(repo)
+            )
+
+        if returncode != 0:
+            kind = classify_git_error(output)
+            return False, kind, f"Clone failed ({kind}): {last_error_line(chr(10).join(output))}"
+
+        if repo.get("sparse"):
+            success, message = self.apply_sparse_checkout(repo, staging)
+            if not success:
+                self._emit(repo_name, f"[WARNING] {message}")
+        return True, None, staging
+
     def clone_repository(self, repo, workspace_path):
-        """Clone a single repository with real-time progress"""
+        """Clone a single repository with real-time progress, retrying transient failures"""
         repo_url = repo["url"]
         repo_name = repo["name"]
         repo_branch = repo.get("branch", "")
         repo_path = workspace_path / repo_name
 
-        print(f"Cloning: {repo_name}")
-        print(f"Source : {repo_url}")
+        if repo.get("lfs") and not self.is_lfs_installed():
+            error_msg = "REPO_N_LFS is set but git-lfs is not installed"
+            self._emit(repo_name, f"[ERROR] {error_msg}")
+            return False, error_msg
+
+        if repo.get("mode") == "worktree":
+            return self.add_worktree_repository(repo, workspace_path)
+        if repo.get("mode") == "shared":
+            return self.add_shared_repository(repo, workspace_path)
+
+        self._emit(repo_name, f"Cloning from {repo_url}")
         if repo_branch:
-            print(f"Branch : {repo_branch}")
+            self._emit(repo_name, f"Branch : {repo_branch}")
 
         try:
-            # Clone with progress output
-            process = subprocess.Popen(
-                ["git", "clone", "--progress", repo_url, str(repo_path)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
-
-            # Stream output in real-time
-            for line in process.stdout:
-                line = line.rstrip()
-                if line:
-                    print(f"  {line}")
-
-            process.wait()
-
-            if process.returncode == 0:
-                # Switch to specified branch if provided
-                if repo_branch:
-                    print(f"  Switching to branch: {repo_branch}")
-                    checkout_process = subprocess.run(
-                        ["git", "-C", str(repo_path), "checkout", repo_branch],
-                        capture_output=True,
-                        text=True
-                    )
-                    if checkout_process.returncode == 0:
-                        print(f"  [OK] Checked out branch: {repo_branch}")
-                    else:
-                        error_msg = checkout_process.stderr.strip()
-                        print(f"  [WARNING] Branch checkout failed: {error_msg}")
-                
-                print("")
-                return True, repo_path
-            else:
-                error_msg = f"Clone failed (exit code: {process.returncode})"
-                print(f"[ERROR] {error_msg}\n")
+            success, error_msg = self._prepare_clone_target(repo_name, repo_path)
+            if not success:
+                self._emit(repo_name, f"[ERROR] {error_msg}")
                 return False, error_msg
 
+            # Clones are written to a hidden staging directory and renamed into
+            # place when complete, so a failed or interrupted clone is never
+            # mistaken for a finished one.
+            staging = self._staging_path(repo_path)
+            attempts = self.config.clone_retries + 1
+            for attempt in range(1, attempts + 1):
+                success, kind, result = self._clone_once(repo, staging)
+                if success and repo.get("lfs"):
+                    success, kind, result = self.pull_lfs_objects(repo, staging)
+                if success and repo.get("submodules"):
+                    success, kind, result = self.update_submodules(repo, staging)
+                if success:
+                    os.replace(staging, repo_path)
+                    self._configure_clone(repo_name, repo_path)
+                    return True, repo_path
+
+                force_rmtree(staging)
+                if kind not in RETRYABLE_ERRORS or attempt == attempts:
+                    self._emit(repo_name, f"[ERROR] {result}")
+                    return False, result
+
+                delay = self.config.clone_retry_backoff * (2 ** (attempt - 1))
+                self._emit(
+                    repo_name,
+                    f"[WARNING] {result} - retrying in {delay:g}s "
+                    f"(attempt {attempt + 1}/{attempts})"
+                )
+                time.sleep(delay)
+
         except FileNotFoundError:
             error_msg = "Git is not installed or not in PATH"
-            print(f"[ERROR] {error_msg}\n")
+            self._emit(repo_name, f"[ERROR] {error_msg}")
             return False, error_msg
         except Exception as e:
             error_msg = f"Clone failed: {str(e)}"
-            print(f"[ERROR] {error_msg}\n")
+            self._emit(repo_name, f"[ERROR] {error_msg}")
             return False, error_msg
 
+    def is_lfs_installed(self):
+        """Check if the git-lfs extension is available"""
+        return run_git(["lfs", "version"]).returncode == 0
+
+    def pull_lfs_objects(self, repo, repo_path):
+        """Download and check out the LFS objects of a checkout in one parallel batch"""
+        repo_name = repo["name"]
+        if not self.is_lfs_installed():
+            return False, "lfs", "REPO_N_LFS is set but git-lfs is not installed"
+
+        # Stored in the repository so later pulls and checkouts by hand
+        # honour the same include/exclude patterns.
+        run_git(["lfs", "install", "--local"], cwd=repo_path)
+        for key, patterns in (("lfs.fetchinclude", repo.get("lfs_include")),
+                              ("lfs.fetchexclude", repo.get("lfs_exclude"))):
+            if patterns:
+                run_git(["config", key, ",".join(patterns)], cwd=repo_path)
+            else:
+                run_git(["config", "--unset", key], cwd=repo_path)
+
+        concurrency = self.config.lfs_concurrency
+        self._emit(repo_name, f"Downloading LFS objects ({concurrency} parallel transfer(s))...")
+        started = time.monotonic()
+        returncode, output = self._run_git_streamed(
+            repo_name,
+            ["git", "-C", str(repo_path), "-c", f"lfs.concurrenttransfers={concurrency}",
+             "lfs", "pull"]
+        )
+        elapsed = time.monotonic() - started
+        self.lfs_seconds[repo_name] = self.lfs_seconds.get(repo_name, 0.0) + elapsed
+
+        if returncode != 0:
+            kind = classify_git_error(output)
+            return False, kind, (
+                f"LFS download failed ({kind}): {last_error_line(chr(10).join(output))}"
+            )
+        self._emit(repo_name, f"LFS objects downloaded in {elapsed:.1f}s")
+        return True, None, "LFS objects downloaded"
+
+    def _submodule_entries(self, repo_path):
+        """Initialized submodules of a checkout as (name, path, url) tuples"""
+        listed = run_git(
+            ["config", "-f", ".gitmodules", "--get-regexp", r"^submodule\..*\.path$"],
+            cwd=repo_path
+        )
+        entries = []
+        for line in listed.stdout.splitlines():
+            key, _, path = line.partition(" ")
+            name = key[len("submodule."):-len(".path")]
+            # submodule init resolved relative URLs into .git/config
+            ok, url = self._git_output(repo_path, ["config", f"submodule.{name}.url"])
+            if ok and url:
+                entries.append((name, path, url))
+        return entries
+
+    def update_submodules(self, repo, repo_path):
+        """Recursively check out the submodules of a repository in parallel"""
+        repo_name = repo["name"]
+        repo_path = Path(repo_path)
+        if not (repo_path / ".gitmodules").exists():
+            return True, None, "No submodules"
+
+        shallow_args = ["--depth=1"] if repo.get("shallow_submodules") else []
+        jobs = self.config.submodule_jobs
+        self._emit(repo_name, f"Updating submodules ({jobs} parallel job(s))...")
+
+        if self.config.use_mirror_cache:
+            return self._update_submodules_from_mirrors(repo_name, repo_path, shallow_args)
+
+        returncode, output = self._run_git_streamed(
+            repo_name,
+            ["git", "-C", str(repo_path), "submodule", "update", "--init", "--recursive",
+             "--progress", f"--jobs={jobs}"] + shallow_args
+        )
+        if returncode != 0:
+            kind = classify_git_error(output)
+            return False, kind, (
+                f"Submodule update failed ({kind}): {last_error_line(chr(10).join(output))}"
+            )
+        return True, None, "Submodules updated"
+
+    def _update_submodules_from_mirrors(self, repo_name, repo_path, shallow_args):
+        """Check out submodules borrowing objects from per-URL mirrors, recursively"""
+        result = run_git(["submodule", "init"], cwd=repo_path)
+        if result.returncode != 0:
+            return False, "unknown", f"Submodule init failed: {last_error_line(result.stderr)}"
+
+        def update(entry):
+            name, path, url = entry
+            # Submodules shared by several repositories share one mirror,
+            # so their objects are downloaded once per base directory.
+            success, mirror = self.mirror_manager.update_mirror(url)
+            if not success:
+                self._emit(repo_name, f"[WARNING] {path}: {mirror}")
+                mirror = self.mirror_manager.get_mirror(url)
+            reference_args = ["--reference", str(mirror)] if mirror else []
+            if mirror and self.config.mirror_dissociate:
+                reference_args.append("--dissociate")
+
+            returncode, output = self._run_git_streamed(
+                repo_name,
+                ["git", "-C", str(repo_path), "submodule", "update", "--progress"]
+                + reference_args + shallow_args + ["--", path]
+            )
+            if returncode != 0:
+                kind = classify_git_error(output)
+                return False, kind, (
+                    f"Submodule {path} failed ({kind}): {last_error_line(chr(10).join(output))}"
+                )
+            if (repo_path / path / ".gitmodules").exists():
+                return self._update_submodules_from_mirrors(
+                    repo_name, repo_path / path, shallow_args
+                )
+            return True, None, path
+
+        entries = self._submodule_entries(repo_path)
+        if not entries:
+            return True, None, "No submodules"
+        workers = min(self.config.submodule_jobs, len(entries))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(update, entries))
+
+        for success, kind, message in outcomes:
+            if not success:
+                return False, kind, message
+        return True, None, "Submodules updated"
+
+    def get_sparse_paths(self, repo_path):
+        """Return the current sparse-checkout cone, or None if not sparse"""
+        enabled = run_git(["config", "--bool", "core.sparseCheckout"], cwd=repo_path)
+        if enabled.stdout.strip() != "true":
+            return None
+        listed = run_git(["sparse-checkout", "list"], cwd=repo_path)
+        return [line.strip() for line in listed.stdout.splitlines() if line.strip()]
+
+    def apply_sparse_checkout(self, repo, repo_path):
+        """Widen, narrow or disable the sparse checkout to match REPO_N_SPARSE"""
+        repo_name = repo["name"]
+        wanted = repo.get("sparse", [])
+        current = self.get_sparse_paths(repo_path)
+
+        if not wanted:
+            if current is None:
+                return True, "Full checkout"
+            self._emit(repo_name, "Disabling sparse checkout (full working tree)")
+            result = run_git(["sparse-checkout", "disable"], cwd=repo_path,
+                             env=self._checkout_env(repo))
+        else:
+            if current is not None and sorted(current) == sorted(wanted):
+                return True, "Sparse checkout up to date"
+            self._emit(repo_name, f"Sparse checkout: {', '.join(wanted)}")
+            result = run_git(["sparse-checkout", "set", "--cone"] + wanted, cwd=repo_path,
+                             env=self._checkout_env(repo))
+
+        if result.returncode != 0:
+            return False, f"Sparse checkout failed: {last_error_line(result.stderr)}"
+        return True, "Sparse checkout updated"
+
+    def sync_sparse_checkouts(self, workspace_path, repos):
+        """Apply the configured sparse cone to repositories already cloned"""
+        for repo in repos:
+            if repo.get("mode") == "shared":
+                continue
+            repo_path = Path(workspace_path) / repo["name"]
+            success, message = self.apply_sparse_checkout(repo, repo_path)
+            if not success:
+                self._emit(repo["name"], f"[WARNING] {message}")
+
+    def _git_output(self, repo_path, args):
+        """Run a git command in repo_path and return (ok, stripped stdout)"""
+        result = run_git(args, cwd=repo_path)
+        return result.returncode == 0, result.stdout.strip()
+
+    def refresh_repository(self, repo, workspace_path):
+        """Fast-forward a clean repository if its upstream branch moved"""
+        repo_path = Path(workspace_path) / repo["name"]
+        if repo.get("mode") == "shared":
+            return self.refresh_shared_repository(repo, workspace_path)
+
+        ok, changes = self._git_output(repo_path, ["status", "--porcelain", "--untracked-files=no"])
+        if not ok:
+            return "failed", "Not a usable git repository"
+        if changes:
+            return "skipped", "Local modifications present"
+
+        ok, branch = self._git_output(repo_path, ["symbolic-ref", "--short", "-q", "HEAD"])
+        if not ok:
+            return "skipped", "Detached HEAD"
+
+        ok, upstream = self._git_output(
+            repo_path, ["rev-parse", "--abbrev-ref", "--symbolic-full-name", "@{u}"]
+        )
+        if not ok or "/" not in upstream:
+            return "skipped", f"Branch '{branch}' has no upstream"
+        remote, remote_branch = upstream.split("/", 1)
+
+        # Cheap check: one ls-remote round trip instead of a full fetch
+        ok, remote_line = self._git_output(
+            repo_path, ["ls-remote", remote, f"refs/heads/{remote_branch}"]
+        )
+        if not ok:
+            return "failed", f"Could not reach {remote}"
+        if not remote_line:
+            return "skipped", f"Upstream branch '{upstream}' no longer exists"
+        remote_sha = remote_line.split()[0]
+
+        _, upstream_sha = self._git_output(repo_path, ["rev-parse", "@{u}"])
+        if remote_sha != upstream_sha:
+            result = run_git(["fetch", "--quiet", remote, remote_branch], cwd=repo_path)
+            if result.returncode != 0:
+                return "failed", f"Fetch failed: {last_error_line(result.stderr)}"
+
+        _, head_sha = self._git_output(repo_path, ["rev-parse", "HEAD"])
+        _, upstream_sha = self._git_output(repo_path, ["rev-parse", "@{u}"])
+        if head_sha == upstream_sha:
+            return "up-to-date", f"{branch} at {head_sha[:8]}"
+
+        behind = run_git(["merge-base", "--is-ancestor", "HEAD", "@{u}"], cwd=repo_path)
+        if behind.returncode != 0:
+            ahead = run_git(["merge-base", "--is-ancestor", "@{u}", "HEAD"], cwd=repo_path)
+            if ahead.returncode == 0:
+                return "up-to-date", f"{branch} has local commits not yet pushed"
+            return "diverged", f"{branch} and {upstream} have diverged"
+
+        result = run_git(["merge", "--ff-only", "--quiet", "@{u}"], cwd=repo_path,
+                         env=self._checkout_env(repo))
+        if result.returncode != 0:
+            return "failed", f"Fast-forward failed: {last_error_line(result.stderr)}"
+        if repo.get("lfs"):
+            success, _, message = self.pull_lfs_objects(repo, repo_path)
+            if not success:
+                return "failed", message
+        if repo.get("submodules"):
+            success, _, message = self.update_submodules(repo, repo_path)
+            if not success:
+                return "failed", message
+        return "updated", f"{branch} {head_sha[:8]} -> {upstream_sha[:8]}"
+
+    def refresh_shared_repository(self, repo, workspace_path):
+        """Relink a workspace to the shared checkout of the configured ref's latest commit"""
+        repo_path = Path(workspace_path) / repo["name"]
+        before = self.shared_manager.linked_checkout(repo_path)
+        if before is None:
+            return "skipped", "Not a shared checkout link"
+
+        success, result = self.add_shared_repository(repo, Path(workspace_path))
+        if not success:
+            return "failed", result
+        after = self.shared_manager.linked_checkout(repo_path)
+        if after == before:
+            return "up-to-date", f"shared {after.name}"
+        return "updated", f"shared {before.name} -> {after.name}"
+
+    def refresh_repositories(self, workspace_path, repos):
+        """Concurrently refresh already cloned repositories"""
+        repos = list(repos)
+        if not repos:
+            return []
+
+        def refresh(repo):
+            try:
+                with self._host_slot(repo["url"]):
+                    return self.refresh_repository(repo, workspace_path)
+            except Exception as e:
+                return "failed", str(e)
+
+        ordered = self._interleave_by_host(repos)
+        workers = min(self.config.clone_concurrency, len(repos))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = dict(zip(
+                (repo["name"] for repo in ordered), executor.map(refresh, ordered)
+            ))
+        outcomes = [outcomes[repo["name"]] for repo in repos]
+
+        return [
+            {"repo": repo["name"], "status": status, "message": message}
+            for repo, (status, message) in zip(repos, outcomes)
+        ]
+
+    def prefetch_repository(self, repo):
+        """Fetch a repository into its local cache (central clone or mirror)"""
+        # Shared checkouts are worktrees of the same central clone
+        if repo.get("mode") in ("worktree", "shared"):
+            return self.worktree_manager.update_central(repo["url"])
+        return self.mirror_manager.update_mirror(repo["url"])
+
+    def prefetch_repositories(self, repos=None):
+        """Concurrently fetch every repository into the local caches"""
+        repos = list(repos if repos is not None else self.config.repositories)
+        if not repos:
+            return []
+
+        def prefetch(repo):
+            started = time.monotonic()
+            try:
+                with self._host_slot(repo["url"]):
+                    success, result = self.prefetch_repository(repo)
+            except Exception as e:
+                success, result = False, str(e)
+            return success, result, time.monotonic() - started
+
+        ordered = self._interleave_by_host(repos)
+        workers = min(self.config.clone_concurrency, len(repos))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = dict(zip(
+                (repo["name"] for repo in ordered), executor.map(prefetch, ordered)
+            ))
+
+        return [
+            {"repo": repo["name"], "success": outcomes[repo["name"]][0],
+             "result": outcomes[repo["name"]][1], "seconds": outcomes[repo["name"]][2]}
+            for repo in repos
+        ]
+
     def clone_all_repositories(self, workspace_path, repos_to_clone=None):
-        """Clone all configured repositories or specific list"""
-        results = []
-        
+        """Clone all configured repositories or specific list concurrently"""
         repos = repos_to_clone if repos_to_clone is not None else self.config.repositories
+        repos = list(repos)
+        if not repos:
+            return []
 
-        for repo in repos:
-            success, result = self.clone_repository(repo, workspace_path)
-            results.append({"repo": repo["name"], "success": success, "result": result})
+        workers = min(self.config.clone_concurrency, len(repos))
+        print(f"Cloning {len(repos)} repository(ies) with {workers} worker(s)...")
+        if self.config.clone_host_concurrency:
+            print(f"At most {self.config.clone_host_concurrency} per host")
+        print("")
+
+        def clone(repo):
+            with self._host_slot(repo["url"]):
+                success, result = self.clone_repository(repo, workspace_path)
+            self.progress.finish(repo["name"], success)
+            return success, result
+
+        # Submitted round-robin by host; results are reported in config order
+        ordered = self._interleave_by_host(repos)
+        self.progress.begin([repo["name"] for repo in repos])
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                outcomes = dict(zip(
+                    (repo["name"] for repo in ordered), executor.map(clone, ordered)
+                ))
+        finally:
+            self.progress.end()
+        outcomes = [outcomes[repo["name"]] for repo in repos]
+
+        if self.config.post_clone_maintenance:
+            # Commit-graph and multi-pack-index writes are not needed to build,
+            # so they run detached instead of delaying the remaining steps.
+            cloned = [result for success, result in outcomes if success]
+            if self.maintenance_manager.start_background(cloned):
+                print("\n[INFO] Repository maintenance continues in the background")
 
-        return results
+        print("")
+        return [
+            {"repo": repo["name"], "success": success, "result": result,
+             "lfs_seconds": self.lfs_seconds.get(repo["name"])}
+            for repo, (success, result) in zip(repos, outcomes)
+        ]
 
     def check_git_installed(self):
         """Check if Git is installed"""
@@ -0,0 +1,235 @@
+"""
+Worktree Manager - Central per-repository clones that workspaces attach to as git worktrees
+"""
+
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+
+from file_lock import FileLock
+from git_utils import run_git, last_error_line, repo_slug
+
+
+class WorktreeManager:
+    """Manages central clones and the worktrees checked out from them"""
+
+    # branch.<name>.<key> in a central clone names the workspace add_worktree created it for
+    WORKSPACE_KEY = "workspace"
+
+    def __init__(self, config):
+        """Initialize worktree manager with configuration"""
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    @property
+    def store_root(self):
+        """Directory holding every central clone"""
+        return Path(self.config.workspace_base_path) / self.config.worktree_store_dir
+
+    def central_path(self, url):
+        """Location of the central clone for a repository URL"""
+        return self.store_root / f"{repo_slug(url)}.git"
+
+    def _lock_for(self, url):
+        """Serialize operations on the same central clone between threads"""
+        with self._locks_guard:
+            return self._locks.setdefault(url, threading.Lock())
+
+    def update_central(self, url):
+        """Create the central clone for url or fetch new commits into it"""
+        path = self.central_path(url)
+        with self._lock_for(url), FileLock(path.with_name(f"{path.name}.lock")):
+            if not (path / "HEAD").exists():
+                success, message = self._create_central(url, path)
+                if not success:
+                    return False, message
+
+            result = run_git(["--git-dir", str(path), "fetch", "--prune", "--quiet", "origin"])
+            if result.returncode != 0:
+                return False, f"Central clone update failed: {last_error_line(result.stderr)}"
+            return True, path
+
+    def _create_central(self, url, path):
+        """Initialize a bare central clone with remote-tracking refs only"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        staging = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+        shutil.rmtree(staging, ignore_errors=True)
+
+        self.logger.info(f"Creating central clone for {url}: {path}")
+        # Only refs/remotes/origin/* is fetched, so branches that workspaces
+        # check out never collide with refs updated by later fetches.
+        steps = [
+            ["init", "--bare", "--quiet", str(staging)],
+            ["--git-dir", str(staging), "remote", "add", "origin", url],
+            ["--git-dir", str(staging), "fetch", "--quiet", "origin"],
+            ["--git-dir", str(staging), "remote", "set-head", "origin", "--auto"],
+        ]
+        for step in steps:
+            result = run_git(step)
+            if result.returncode != 0:
+                shutil.rmtree(staging, ignore_errors=True)
+                return False, f"Central clone failed: {last_error_line(result.stderr)}"
+
+        try:
+            os.replace(staging, path)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+        return True, path
+
+    def default_branch(self, central):
+        """Branch that origin/HEAD points to in a central clone"""
+        result = run_git(["--git-dir", str(central), "symbolic-ref", "--short",
+                          "refs/remotes/origin/HEAD"])
+        if result.returncode != 0:
+            return None
+        return result.stdout.strip().split("/", 1)[-1]
+
+    def has_remote_branch(self, central, branch):
+        """Check if origin/<branch> exists in a central clone"""
+        result = run_git(["--git-dir", str(central), "rev-parse", "--verify", "--quiet",
+                          f"refs/remotes/origin/{branch}"])
+        return result.returncode == 0
+
+    def add_worktree(self, url, central, repo_path, branch, local_branch, no_checkout=False):
+        """Attach a new worktree for branch at repo_path"""
+        cmd = ["--git-dir", str(central), "worktree", "add", "--quiet"]
+        if no_checkout:
+            cmd.append("--no-checkout")
+        cmd += ["--track", "-B", local_branch, str(repo_path), f"origin/{branch}"]
+
+        with self._lock_for(url):
+            result = run_git(cmd)
+            if result.returncode != 0:
+                return False, f"Worktree creation failed: {last_error_line(result.stderr)}"
+            # Recorded so that only branches made here are ever deleted again;
+            # branches developers create live in the same central clone.
+            result = run_git(["--git-dir", str(central), "config",
+                              f"branch.{local_branch}.{self.WORKSPACE_KEY}",
+                              Path(repo_path).parent.name])
+        if result.returncode != 0:
+            self.logger.warning(
+                f"Recording branch {local_branch} in {central.name} failed: "
+                f"{last_error_line(result.stderr)}"
+            )
+        return True, repo_path
+
+    @staticmethod
+    def worktree_gitdir(repo_path):
+        """Return the gitdir a worktree's .git file points to, or None"""
+        git_file = Path(repo_path) / ".git"
+        if not git_file.is_file():
+            return None
+        try:
+            content = git_file.read_text(encoding="utf-8").strip()
+        except OSError:
+            return None
+        if not content.startswith("gitdir:"):
+            return None
+        gitdir = Path(content[len("gitdir:"):].strip())
+        if not gitdir.is_absolute():
+            gitdir = (Path(repo_path) / gitdir).resolve()
+        return gitdir
+
+    def is_worktree(self, repo_path):
+        """Check if repo_path is a linked worktree"""
+        return self.worktree_gitdir(repo_path) is not None
+
+    def is_dangling(self, repo_path):
+        """A worktree whose registration in the central clone is gone"""
+        gitdir = self.worktree_gitdir(repo_path)
+        return gitdir is not None and not (gitdir / "HEAD").exists()
+
+    @staticmethod
+    def _worktree_branch(gitdir):
+        """Branch a worktree has checked out, from its HEAD in the central clone"""
+        try:
+            head = (gitdir / "HEAD").read_text(encoding="utf-8").strip()
+        except OSError:
+            return None
+        if head.startswith("ref: refs/heads/"):
+            return head[len("ref: refs/heads/"):]
+        return None
+
+    def remove_worktree(self, repo_path):
+        """Deregister and delete a worktree along with the branches created for its workspace"""
+        gitdir = self.worktree_gitdir(repo_path)
+        if gitdir is None:
+            return False, f"Not a worktree: {repo_path}"
+
+        # <central>/worktrees/<id> -> <central>
+        central = gitdir.parent.parent
+        branch = self._worktree_branch(gitdir)
+        removed = False
+        if (central / "HEAD").exists():
+            result = run_git(["--git-dir", str(central), "worktree", "remove", "--force",
+                              "--force", str(repo_path)])
+            removed = result.returncode == 0
+            if not removed:
+                self.logger.warning(
+                    f"git worktree remove failed for {repo_path}: {last_error_line(result.stderr)}"
+                )
+
+        if not removed:
+            shutil.rmtree(repo_path, ignore_errors=True)
+            self.prune_central(central)
+        workspace_name = Path(repo_path).parent.name
+        owners = self.workspace_branches(central)
+        for branch in self.stale_branches(central, live_names=()):
+            if owners.get(branch) == workspace_name:
+                self.delete_branch(central, branch)
+        return True, repo_path
+
+    def delete_branch(self, central, branch):
+        """Delete a local branch of a central clone (git refuses while it is checked out)"""
+        result = run_git(["--git-dir", str(central), "branch", "--quiet", "-D", branch])
+        if result.returncode != 0:
+            self.logger.warning(
+                f"Deleting branch {branch} in {central.name} failed: "
+                f"{last_error_line(result.stderr)}"
+            )
+        return result.returncode == 0
+
+    def workspace_branches(self, central):
+        """Branches add_worktree created in a central clone, mapped to their workspace name"""
+        result = run_git(["--git-dir", str(central), "config", "--get-regexp",
+                          rf"^branch\..*\.{self.WORKSPACE_KEY}$"])
+        branches = {}
+        for line in result.stdout.splitlines():
+            key, _, workspace_name = line.partition(" ")
+            branch = key[len("branch."):-len(f".{self.WORKSPACE_KEY}")]
+            if branch.startswith(f"{workspace_name}/"):
+                branches[branch] = workspace_name
+        return branches
+
+    def stale_branches(self, central, live_names):
+        """Recorded workspace branches checked out nowhere whose workspace is not in live_names"""
+        result = run_git(["--git-dir", str(central), "worktree", "list", "--porcelain"])
+        if result.returncode != 0:
+            return []
+        checked_out = {
+            line[len("branch refs/heads/"):] for line in result.stdout.splitlines()
+            if line.startswith("branch refs/heads/")
+        }
+        return [
+            branch for branch, workspace_name in self.workspace_branches(central).items()
+            if branch not in checked_out and workspace_name not in live_names
+        ]
+
+    def prune_central(self, central):
+        """Drop registrations of worktrees whose directories no longer exist"""
+        result = run_git(["--git-dir", str(central), "worktree", "prune"])
+        return result.returncode == 0
+
+    def prune_all(self):
+        """Prune stale worktree registrations in every central clone"""
+        if not self.store_root.exists():
+            return 0
+        pruned = 0
+        for central in self.store_root.glob("*.git"):
+            if (central / "HEAD").exists() and self.prune_central(central):
+                pruned += 1
+        return pruned